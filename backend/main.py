@@ -1,6 +1,8 @@
 import os
 import logging
 import asyncio
+import hashlib
+import time
 from pathlib import Path
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
@@ -13,11 +15,15 @@ load_dotenv(dotenv_path=env_path)
 print(f"[DEBUG] GITHUB_TOKEN loaded: {bool(os.getenv('GITHUB_TOKEN'))}")
 print(f"[DEBUG] HF_TOKEN loaded: {bool(os.getenv('HUGGINGFACEHUB_API_TOKEN'))}")
 
-from fastapi import FastAPI, HTTPException
+import orjson
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional, List
+from typing import Dict, Iterator, Optional, List
 from pydantic import BaseModel
 
+from backend.tools.github_engine import RateLimitError
+
 # Logging setup
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -27,34 +33,75 @@ rag_engine = None
 fetcher = None
 analyzer = None
 gh_engine = None  # For issue search
+http_client = None  # Shared HTTP/2 client for GitHub REST traffic
+
+# In-flight blocking calls keyed by their arguments, so concurrent identical
+# requests share one execution instead of each paying for the LLM round-trip
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+async def _evict_answer_cache_periodically():
+    """Drop expired entries from the semantic answer cache once a day."""
+    while True:
+        await asyncio.sleep(86400)
+        try:
+            await asyncio.to_thread(rag_engine.evict_cached_answers)
+        except Exception as e:
+            logger.warning(f"Answer cache eviction failed: {e}")
+
+
+async def _singleflight(name: str, func, *args):
+    """Run func(*args) in a thread, joining an identical call already in flight."""
+    key = hashlib.blake2b(
+        "|".join([name, *map(str, args)]).encode(), digest_size=16
+    ).hexdigest()
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(asyncio.to_thread(func, *args))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # Shield so one caller disconnecting doesn't cancel the shared work
+    return await asyncio.shield(task)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize components at startup."""
-    global rag_engine, fetcher, analyzer, gh_engine
+    global rag_engine, fetcher, analyzer, gh_engine, http_client
+    
+    from backend.rag.fetcher import GitHubFetcher, create_github_client
+    
+    http_client = create_github_client()
     
     try:
         from backend.rag.engine import RAGEngine
-        from backend.rag.fetcher import GitHubFetcher
         from backend.rag.analyzer import RepositoryAnalyzer
         from backend.tools.github_engine import GitHubEngine
         
         gh_engine = GitHubEngine()
         rag_engine = RAGEngine()
-        fetcher = GitHubFetcher()
+        fetcher = GitHubFetcher(client=http_client)
         analyzer = RepositoryAnalyzer(rag_engine)
+        
+        # Run one encode so tokenizer/model initialization happens before the
+        # first request instead of stalling it
+        await asyncio.to_thread(rag_engine.embed_batch, ["warmup"])
         logger.info("All components initialized successfully!")
     except Exception as e:
         logger.error(f"Failed to initialize components: {e}")
         import traceback
         traceback.print_exc()
     
+    eviction_task = asyncio.create_task(_evict_answer_cache_periodically())
+    
     yield  # App runs here
     
-    # Cleanup (if needed)
+    # Cleanup
     logger.info("Shutting down...")
+    eviction_task.cancel()
+    await http_client.aclose()
 
-app = FastAPI(title="Opstream API", lifespan=lifespan)
+app = FastAPI(title="Opstream API", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # CORS Setup
 app.add_middleware(
@@ -106,6 +153,9 @@ class IssueSkillsRequest(BaseModel):
     labels: List[str] = []
     language: str = ""
 
+class IssueSkillsBatchRequest(BaseModel):
+    items: List[IssueSkillsRequest]
+
 class CodeReviewRequest(BaseModel):
     code: str
     context: str = ""
@@ -125,26 +175,30 @@ async def health_check():
     }
 
 
+# Static domain list, serialized once at import time
+_DOMAINS_JSON = orjson.dumps({
+    "domains": [
+        {"id": "react", "label": "React", "icon": "⚛️"},
+        {"id": "python", "label": "Python", "icon": "🐍"},
+        {"id": "machine-learning", "label": "Machine Learning", "icon": "🤖"},
+        {"id": "javascript", "label": "JavaScript", "icon": "📜"},
+        {"id": "typescript", "label": "TypeScript", "icon": "💎"},
+        {"id": "rust", "label": "Rust", "icon": "🦀"},
+        {"id": "go", "label": "Go", "icon": "🐹"},
+        {"id": "java", "label": "Java", "icon": "☕"},
+        {"id": "web", "label": "Web/Frontend", "icon": "🌐"},
+        {"id": "backend", "label": "Backend/API", "icon": "⚙️"},
+        {"id": "mobile", "label": "Mobile", "icon": "📱"},
+        {"id": "devops", "label": "DevOps", "icon": "🚀"},
+        {"id": "data", "label": "Data Science", "icon": "📊"},
+    ]
+})
+
+
 @app.get("/api/domains")
 async def get_domains():
     """Get available domains for filtering issues."""
-    return {
-        "domains": [
-            {"id": "react", "label": "React", "icon": "⚛️"},
-            {"id": "python", "label": "Python", "icon": "🐍"},
-            {"id": "machine-learning", "label": "Machine Learning", "icon": "🤖"},
-            {"id": "javascript", "label": "JavaScript", "icon": "📜"},
-            {"id": "typescript", "label": "TypeScript", "icon": "💎"},
-            {"id": "rust", "label": "Rust", "icon": "🦀"},
-            {"id": "go", "label": "Go", "icon": "🐹"},
-            {"id": "java", "label": "Java", "icon": "☕"},
-            {"id": "web", "label": "Web/Frontend", "icon": "🌐"},
-            {"id": "backend", "label": "Backend/API", "icon": "⚙️"},
-            {"id": "mobile", "label": "Mobile", "icon": "📱"},
-            {"id": "devops", "label": "DevOps", "icon": "🚀"},
-            {"id": "data", "label": "Data Science", "icon": "📊"},
-        ]
-    }
+    return Response(content=_DOMAINS_JSON, media_type="application/json")
 
 
 @app.post("/api/issues")
@@ -154,13 +208,18 @@ async def search_issues(request: IssueSearchRequest):
         raise HTTPException(status_code=503, detail="GitHub Engine unavailable. Check GITHUB_TOKEN.")
     
     try:
-        issues = await asyncio.to_thread(
-            gh_engine.search_issues, 
+        issues = await gh_engine.search_issues_async(
             limit=request.limit,
             domain=request.domain,
             sort_by=request.sort_by
         )
         return {"issues": issues, "domain": request.domain, "sort_by": request.sort_by}
+    except RateLimitError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(max(int(e.reset_at - time.time()), 1))}
+        )
     except Exception as e:
         logger.error(f"Search failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -191,11 +250,7 @@ async def index_repository(request: IndexRepoRequest):
     
     try:
         # Fetch all data from the repository
-        data = await asyncio.to_thread(
-            fetcher.fetch_all,
-            request.repo_url,
-            request.issue_limit
-        )
+        data = await fetcher.fetch_all(request.repo_url, request.issue_limit)
         
         repo_name = data["repo_name"]
         documents = data["documents"]
@@ -206,15 +261,9 @@ async def index_repository(request: IndexRepoRequest):
                 detail="No data could be fetched from the repository"
             )
         
-        # Delete existing data for this repo (re-index)
-        await asyncio.to_thread(rag_engine.delete_repo, repo_name)
-        
-        # Index the documents
-        count = await asyncio.to_thread(
-            rag_engine.index_documents,
-            repo_name,
-            documents
-        )
+        # Index the documents (incremental: unchanged documents are skipped
+        # and documents no longer in the repo are removed)
+        count = await rag_engine.index_documents_async(repo_name, documents)
         
         return IndexRepoResponse(
             status="success",
@@ -241,7 +290,8 @@ async def analyze_repository(request: AnalyzeRequest):
         raise HTTPException(status_code=503, detail="Analyzer unavailable")
     
     try:
-        result = await asyncio.to_thread(
+        result = await _singleflight(
+            "analyze",
             analyzer.analyze,
             request.repo_name,
             request.question
@@ -257,6 +307,33 @@ async def analyze_repository(request: AnalyzeRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _sse(events: Iterator[Dict]) -> Iterator[bytes]:
+    """Format events as Server-Sent Events frames, ending with a done marker."""
+    try:
+        for event in events:
+            yield b"data: " + orjson.dumps(event) + b"\n\n"
+    except Exception as e:
+        logger.error(f"Stream failed: {e}")
+        yield b"data: " + orjson.dumps({"error": str(e)}) + b"\n\n"
+    yield b"data: " + orjson.dumps({"done": True}) + b"\n\n"
+
+
+@app.post("/api/analyze/stream")
+async def analyze_repository_stream(request: AnalyzeRequest):
+    """
+    Streaming variant of /api/analyze (text/event-stream).
+    Emits a sources event, then answer deltas as the LLM generates them.
+    """
+    if not analyzer:
+        raise HTTPException(status_code=503, detail="Analyzer unavailable")
+    
+    # Sync generators are iterated in the thread pool, off the event loop
+    return StreamingResponse(
+        _sse(analyzer.analyze_stream(request.repo_name, request.question)),
+        media_type="text/event-stream"
+    )
+
+
 @app.post("/api/suggest", response_model=SuggestResponse)
 async def suggest_contributions(request: SuggestRequest):
     """
@@ -312,11 +389,22 @@ class DifficultyRequest(BaseModel):
     issue_body: str = ""
     labels: List[str] = []
 
+class DifficultyBatchRequest(BaseModel):
+    items: List[DifficultyRequest]
+
 class RelevantFilesRequest(BaseModel):
     repo_name: str
     issue_title: str
     issue_body: str = ""
 
+class RelevantFilesItem(BaseModel):
+    issue_title: str
+    issue_body: str = ""
+
+class RelevantFilesBatchRequest(BaseModel):
+    repo_name: str
+    items: List[RelevantFilesItem]
+
 class SetupRequest(BaseModel):
     repo_name: str
 
@@ -331,7 +419,8 @@ async def get_tech_stack(request: TechStackRequest):
         raise HTTPException(status_code=503, detail="Analyzer unavailable")
     
     try:
-        result = await asyncio.to_thread(
+        result = await _singleflight(
+            "tech-stack",
             analyzer.detect_tech_stack,
             request.repo_name
         )
@@ -363,6 +452,28 @@ async def calculate_difficulty(request: DifficultyRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/difficulty/batch")
+async def calculate_difficulty_batch(request: DifficultyBatchRequest):
+    """
+    Calculate difficulty scores for many issues in one request.
+    Returns one result per item, in request order.
+    """
+    if not analyzer:
+        raise HTTPException(status_code=503, detail="Analyzer unavailable")
+    
+    try:
+        results = await asyncio.to_thread(
+            analyzer.calculate_difficulty_batch,
+            [item.issue_title for item in request.items],
+            [item.issue_body for item in request.items],
+            [item.labels for item in request.items]
+        )
+        return {"results": results}
+    except Exception as e:
+        logger.error(f"Batch difficulty calculation failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/api/relevant-files")
 async def find_relevant_files(request: RelevantFilesRequest):
     """
@@ -385,6 +496,27 @@ async def find_relevant_files(request: RelevantFilesRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/relevant-files/batch")
+async def find_relevant_files_batch(request: RelevantFilesBatchRequest):
+    """
+    Find relevant files for many issues of one repository in one request.
+    Returns one file list per item, in request order.
+    """
+    if not analyzer:
+        raise HTTPException(status_code=503, detail="Analyzer unavailable")
+    
+    try:
+        results = await asyncio.to_thread(
+            analyzer.find_relevant_files_batch,
+            request.repo_name,
+            [(item.issue_title, item.issue_body) for item in request.items]
+        )
+        return {"results": results}
+    except Exception as e:
+        logger.error(f"Batch file finding failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/api/setup")
 async def get_setup_instructions(request: SetupRequest):
     """
@@ -432,6 +564,34 @@ async def analyze_issue_skills(request: IssueSkillsRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/issue-skills/batch")
+async def analyze_issue_skills_batch(request: IssueSkillsBatchRequest):
+    """
+    Analyze many issues in one request, several issues per LLM call.
+    Returns one result per item, in request order.
+    """
+    if not analyzer:
+        raise HTTPException(status_code=503, detail="Analyzer unavailable")
+    
+    try:
+        results = await asyncio.to_thread(
+            analyzer.analyze_issues_skills_batch,
+            [
+                {
+                    "title": item.issue_title,
+                    "body": item.issue_body,
+                    "labels": item.labels,
+                    "language": item.language
+                }
+                for item in request.items
+            ]
+        )
+        return {"results": results}
+    except Exception as e:
+        logger.error(f"Batch skill analysis failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/api/code-review")
 async def mock_code_review(request: CodeReviewRequest):
     """
@@ -454,6 +614,21 @@ async def mock_code_review(request: CodeReviewRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/code-review/stream")
+async def mock_code_review_stream(request: CodeReviewRequest):
+    """
+    Streaming variant of /api/code-review (text/event-stream).
+    Emits raw review deltas, then the parsed review as a result event.
+    """
+    if not analyzer:
+        raise HTTPException(status_code=503, detail="Analyzer unavailable")
+    
+    return StreamingResponse(
+        _sse(analyzer.mock_code_review_stream(request.code, request.context, request.language)),
+        media_type="text/event-stream"
+    )
+
+
 @app.post("/api/warmth-score")
 async def get_warmth_score(request: WarmthScoreRequest):
     """
@@ -474,6 +649,47 @@ async def get_warmth_score(request: WarmthScoreRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class RepoOverviewRequest(BaseModel):
+    repo_name: str
+
+@app.post("/api/repo-overview")
+async def get_repo_overview(request: RepoOverviewRequest):
+    """
+    Everything the repo page needs in one call: contribution suggestions,
+    tech stack, setup instructions and warmth score.
+    The four analyses are independent, so they run concurrently.
+    """
+    if not analyzer:
+        raise HTTPException(status_code=503, detail="Analyzer unavailable")
+    
+    try:
+        suggestions, tech_stack, setup, warmth = await asyncio.gather(
+            asyncio.to_thread(analyzer.suggest_contributions, request.repo_name),
+            asyncio.to_thread(analyzer.detect_tech_stack, request.repo_name),
+            asyncio.to_thread(analyzer.extract_setup_instructions, request.repo_name),
+            asyncio.to_thread(analyzer.calculate_warmth_score, request.repo_name)
+        )
+        return {
+            "suggestions": suggestions,
+            "tech_stack": tech_stack,
+            "setup": setup,
+            "warmth": warmth
+        }
+    except Exception as e:
+        logger.error(f"Repo overview failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Single worker by default: the indexed-repo set, index versions and the
+    # caches keyed on them are per-process, so a re-index on one worker
+    # would leave the others stale. WEB_CONCURRENCY opts in to more.
+    uvicorn.run(
+        "backend.main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", 1)),
+        loop="auto",  # uvloop when installed
+        http="auto",  # httptools when installed
+    )
@@ -1,28 +1,80 @@
+import os
 import time
-from typing import Dict, Any, Optional
+import uuid
+import threading
+from typing import Dict, Any, List, Optional
+import redis
+from cachetools import TTLCache
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import Distance, VectorParams, PointStruct, HnswConfigDiff
+
+# Embedded Qdrant store used when no server is configured; anchored to the
+# repository root rather than the working directory
+_LOCAL_STORE_PATH = os.getenv(
+    "TRACKER_QDRANT_PATH",
+    os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "qdrant_data"))
+)
+
+# Contribution window: 1 PR per 24 hours
+_WINDOW_S = 86_400
+
+# Placeholder vector for rejection reasons until real embeddings are stored.
+# Built once and shared by every point (a zero vector is invalid for cosine).
+_DUMMY_REJECTION_VECTOR = [0.1] * 384
 
 class UsageTracker:
-    def __init__(self, location=":memory:"):
+    def __init__(
+        self,
+        location: Optional[str] = None,
+        url: Optional[str] = None,
+        redis_url: Optional[str] = None
+    ):
         """
-        Initialize the UsageTracker with an in-memory Qdrant instance for MVP.
-        In production, this would connect to a persistent Qdrant server.
+        Initialize the UsageTracker.
+
+        Qdrant storage is, in order of preference: an explicit `location`
+        (e.g. ":memory:" for tests), the shared Qdrant server at QDRANT_URL
+        (the same deployment RAGEngine uses), or an embedded on-disk store at
+        TRACKER_QDRANT_PATH (default: qdrant_data/ in the repository root) so
+        state survives restarts. The embedded store locks its folder and
+        serves a single process only; run several workers with QDRANT_URL
+        or REDIS_URL set.
+
+        Rate-limit state is plain key/value data, so when REDIS_URL is set it
+        lives in Redis (one SET with expiry per contribution) and Qdrant only
+        holds the rejection vectors.
         """
-        self.client = QdrantClient(location=location)
+        redis_url = redis_url or os.getenv("REDIS_URL")
+        self.redis = redis.Redis.from_url(redis_url) if redis_url else None
+
+        url = url or os.getenv("QDRANT_URL")
+        if location:
+            self.client = QdrantClient(location=location)
+        elif url:
+            self.client = QdrantClient(url=url, api_key=os.getenv("QDRANT_API_KEY"))
+        else:
+            self.client = QdrantClient(path=_LOCAL_STORE_PATH)
         self._init_collections()
 
+        # user_id -> last contribution timestamp, so the common "already
+        # contributed today" check skips the Qdrant round trip
+        self._last_ts = TTLCache(maxsize=100_000, ttl=_WINDOW_S)
+        self._cache_lock = threading.Lock()
+
     def _init_collections(self):
         """Initialize necessary collections if they don't exist."""
         collections = self.client.get_collections()
         collection_names = [c.name for c in collections.collections]
 
-        if "user_activity" not in collection_names:
+        if self.redis is None and "user_activity" not in collection_names:
             # For simple ID tracking, we can use a dummy vector or just payload
             # But Qdrant requires a vector config. We'll use size 1 for simplicity.
+            # Points are only ever retrieved by ID, so skip building the HNSW graph.
             self.client.create_collection(
                 collection_name="user_activity",
                 vectors_config=VectorParams(size=1, distance=Distance.DOT),
+                hnsw_config=HnswConfigDiff(m=0),
+                on_disk_payload=False,
             )
         
         if "pr_rejections" not in collection_names:
@@ -33,59 +85,107 @@ class UsageTracker:
                 vectors_config=VectorParams(size=384, distance=Distance.COSINE), # Assuming 384 dim model for future
             )
 
+    @staticmethod
+    def _redis_key(user_id: int) -> str:
+        return f"user:{user_id}:last_pr"
+
     def can_contribute(self, user_id: int) -> bool:
         """
         Check if the user is allowed to contribute (1 PR per 24 hours).
         """
-        points = self.client.retrieve(
-            collection_name="user_activity",
-            ids=[user_id]
-        )
-        
-        if not points:
-            return True
-            
-        last_contribution = points[0].payload.get("last_contribution_ts", 0)
-        current_time = time.time()
-        
-        # 24 hours in seconds = 86400
-        return (current_time - last_contribution) > 86400
+        return self.can_contribute_batch([user_id])[0]
+
+    def can_contribute_batch(self, user_ids: List[int]) -> List[bool]:
+        """
+        Check several users at once: one clock read and at most one
+        Redis pipeline / Qdrant retrieve for all cache misses.
+        """
+        now = time.time()
+
+        with self._cache_lock:
+            cached = {user_id: self._last_ts.get(user_id) for user_id in user_ids}
+
+        blocked = {
+            user_id for user_id, ts in cached.items()
+            if ts is not None and (now - ts) <= _WINDOW_S
+        }
+        pending = [user_id for user_id in cached if user_id not in blocked]
+
+        if pending and self.redis is not None:
+            # Keys expire with the window, so existence means "blocked"
+            pipe = self.redis.pipeline(transaction=False)
+            for user_id in pending:
+                pipe.exists(self._redis_key(user_id))
+            blocked.update(
+                user_id for user_id, exists in zip(pending, pipe.execute()) if exists
+            )
+        elif pending:
+            points = self.client.retrieve(
+                collection_name="user_activity",
+                ids=pending,
+                with_payload=True,
+                with_vectors=False
+            )
+            ts_map = {
+                point.id: point.payload.get("last_contribution_ts", 0)
+                for point in points
+            }
+            with self._cache_lock:
+                self._last_ts.update(ts_map)
+            blocked.update(
+                user_id for user_id, ts in ts_map.items() if (now - ts) <= _WINDOW_S
+            )
+
+        return [user_id not in blocked for user_id in user_ids]
 
     def log_contribution(self, user_id: int):
         """
         Log a successful contribution attempt.
         """
+        now = time.time()
+        with self._cache_lock:
+            self._last_ts[user_id] = now
+
+        if self.redis is not None:
+            self.redis.set(self._redis_key(user_id), now, ex=_WINDOW_S)
+            return
+
         self.client.upsert(
             collection_name="user_activity",
             points=[
                 PointStruct(
                     id=user_id,
                     vector=[1.0], # Dummy vector
-                    payload={"last_contribution_ts": time.time()}
+                    payload={"last_contribution_ts": now}
                 )
             ]
         )
 
     def add_rejection(self, reason: str):
+        """Store a single rejection reason."""
+        self.add_rejections([reason])
+
+    def add_rejections(self, reasons: List[str]):
         """
-        Store a rejection reason. 
+        Store rejection reasons in a single upsert.
         In a full implementation, this might embed the text. 
         For MVP, we just store it to show the structure.
         """
-        # We simulate an ID and vector for now
-        import uuid
-        point_id = str(uuid.uuid4())
-        
-        # In a real app, compute embedding for 'reason'
-        dummy_vector = [0.1] * 384 
-        
+        if not reasons:
+            return
+
+        # In a real app, compute embeddings for the reasons
+        points = [
+            PointStruct(
+                id=str(uuid.uuid4()),
+                vector=_DUMMY_REJECTION_VECTOR,
+                payload={"reason": reason}
+            )
+            for reason in reasons
+        ]
+
         self.client.upsert(
             collection_name="pr_rejections",
-            points=[
-                PointStruct(
-                    id=point_id,
-                    vector=dummy_vector,
-                    payload={"reason": reason}
-                )
-            ]
+            points=points,
+            wait=False
         )
@@ -4,13 +4,526 @@ Uses Groq API with Llama 3 for fast, high-quality responses.
 """
 import os
 import logging
-import json
+import copy
+import hashlib
 import re
-from typing import List, Dict, Optional
-import requests
+import threading
+import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Dict, Iterator, Optional, Tuple
+import numpy as np
+import orjson
+import tiktoken
+import httpx
+from cachetools import LRUCache, TTLCache
+from diskcache import Cache
 
 logger = logging.getLogger(__name__)
 
+# Shared HTTP/2 client: LLM calls reuse one multiplexed connection per
+# provider instead of paying a TCP+TLS handshake per request, and parallel
+# calls share it rather than opening a socket each
+_CLIENT = httpx.Client(
+    timeout=60,
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=2,  # connection failures only
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+    )
+)
+
+# Completions are idempotent enough to retry on rate limits and transient 5xx
+_RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+_MAX_RETRIES = 2
+_RETRY_BACKOFF = 0.3
+# Longest Retry-After worth waiting for in a request thread; longer waits
+# (e.g. a daily token limit) fail fast instead of stalling the thread pool
+_MAX_RETRY_AFTER = 5.0
+
+
+def _retry_delay(response: httpx.Response, attempt: int) -> Optional[float]:
+    """
+    Seconds to wait before the next attempt, honoring a numeric Retry-After,
+    or None if the server asks for longer than _MAX_RETRY_AFTER.
+    """
+    try:
+        delay = float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return _RETRY_BACKOFF * 2 ** attempt
+    return delay if delay <= _MAX_RETRY_AFTER else None
+
+
+def _post(url: str, **kwargs) -> httpx.Response:
+    """POST through the shared client, retrying on _RETRY_STATUSES."""
+    for attempt in range(_MAX_RETRIES + 1):
+        response = _CLIENT.post(url, **kwargs)
+        if response.status_code not in _RETRY_STATUSES or attempt == _MAX_RETRIES:
+            return response
+        delay = _retry_delay(response, attempt)
+        if delay is None:
+            return response
+        time.sleep(delay)
+
+
+@contextmanager
+def _post_stream(url: str, **kwargs) -> Iterator[httpx.Response]:
+    """Streaming _post(): retries until the response status is final."""
+    for attempt in range(_MAX_RETRIES + 1):
+        with _CLIENT.stream("POST", url, **kwargs) as response:
+            delay = None
+            if response.status_code in _RETRY_STATUSES and attempt < _MAX_RETRIES:
+                delay = _retry_delay(response, attempt)
+            if delay is None:
+                yield response
+                return
+        time.sleep(delay)
+
+# Outermost JSON object/array in an LLM response. Greedy on purpose: the
+# match must span nested brackets, so it runs from the first opener to the
+# last closer.
+_JSON_OBJ_RE = re.compile(r'\{[\s\S]*\}')
+_JSON_ARR_RE = re.compile(r'\[[\s\S]*\]')
+
+# Source file paths mentioned in indexed content
+_FILE_PATH_RE = re.compile(r'(?:src|lib|app|components?|pages?)/[\w/.-]+\.(?:js|jsx|ts|tsx|py|go|rs|java|rb)')
+
+# Label keywords that shift an issue's difficulty score (substring match)
+_EASY_LABEL_RE = re.compile('|'.join(map(re.escape, [
+    'good first issue', 'beginner', 'easy', 'starter', 'help wanted'
+])))
+_HARD_LABEL_RE = re.compile('|'.join(map(re.escape, [
+    'complex', 'hard', 'expert', 'breaking change', 'architecture'
+])))
+
+# Sampling temperature for every completion (part of the LLM cache key)
+_LLM_TEMPERATURE = 0.3
+
+# Completions are cached by exact prompt for a week, in memory and on disk
+_LLM_CACHE_TTL = 7 * 86400
+_LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".analyzer_cache")
+
+# Prompt context is budgeted in tokens rather than characters. cl100k_base
+# is not Llama's tokenizer but tracks it closely enough for budgeting.
+_TOKEN_ENCODING = "cl100k_base"
+_ANALYZE_CONTEXT_TOKENS = 1500  # Total retrieved context in an analyze prompt
+_ANALYZE_DOC_TOKENS = 400  # Cap per retrieved document
+
+# Parts of the per-repo context block shared by repo-level prompts:
+# name -> (search query, doc type, token budget). readme_setup is the README
+# section that best matches setup questions, which on long READMEs falls
+# past the readme_full (head) budget.
+_REPO_CONTEXT_PARTS = {
+    "metadata": ("repository overview", "metadata", 200),
+    "readme_full": ("repository overview", "readme_full", 1200),
+    "readme_setup": (
+        "install setup run development environment requirements getting started", "readme", 600
+    ),
+    "file_tree": ("repository overview", "file_tree", 400),
+}
+
+# Retrieved documents whose 64-bit SimHashes differ in at most this many bits
+# are treated as near-duplicates (e.g. a README section quoted in an issue)
+_SIMHASH_MAX_DISTANCE = 3
+
+# Issues per batched LLM call; ~10 keeps the prompt around 3k input tokens
+_ISSUE_BATCH_SIZE = 10
+
+# Keyword -> skill taxonomy for tagging issues without an LLM call
+_SKILL_KEYWORDS = {
+    # Concrete technologies only: generic words ("api", "test", "docs",
+    # "build", ...) appear in almost every issue and would let the 2-hit
+    # shortcut in _extract_skills_batch skip the LLM with noise tags
+    # Languages
+    "python": "Python", "javascript": "JavaScript", "typescript": "TypeScript",
+    "java": "Java", "kotlin": "Kotlin", "swift": "Swift", "objective-c": "Objective-C",
+    "golang": "Go", "rust": "Rust", "ruby": "Ruby", "php": "PHP", "c++": "C++",
+    "c#": "C#", "scala": "Scala", "elixir": "Elixir", "haskell": "Haskell",
+    "dart": "Dart", "lua": "Lua", "perl": "Perl", "r language": "R", "julia": "Julia",
+    "bash": "Shell Scripting", "shell script": "Shell Scripting", "powershell": "PowerShell",
+    "sql": "SQL", "graphql": "GraphQL", "html": "HTML", "css": "CSS", "sass": "Sass",
+    "scss": "Sass", "wasm": "WebAssembly", "webassembly": "WebAssembly",
+    # Frontend
+    "react": "React", "react hooks": "React Hooks", "usestate": "React Hooks",
+    "useeffect": "React Hooks", "jsx": "React",
+    "redux": "Redux", "next.js": "Next.js", "nextjs": "Next.js", "vue": "Vue",
+    "nuxt": "Nuxt", "angular": "Angular", "svelte": "Svelte", "tailwind": "Tailwind CSS",
+    "bootstrap": "Bootstrap", "webpack": "Webpack", "vite": "Vite", "babel": "Babel",
+    "eslint": "ESLint", "prettier": "Prettier", "storybook": "Storybook",
+    "a11y": "Accessibility", "i18n": "Internationalization",
+    # Backend / APIs
+    "node.js": "Node.js", "nodejs": "Node.js", "express": "Express", "nestjs": "NestJS",
+    "deno": "Deno", "django": "Django", "flask": "Flask", "fastapi": "FastAPI",
+    "rails": "Ruby on Rails", "spring": "Spring", "laravel": "Laravel", ".net": ".NET",
+    "asp.net": "ASP.NET", "grpc": "gRPC", "protobuf": "Protocol Buffers",
+    "websocket": "WebSockets", "websockets": "WebSockets", "oauth": "OAuth", "jwt": "JWT",
+    "asyncio": "Async Programming", "race condition": "Concurrency",
+    "multithreading": "Concurrency", "multiprocessing": "Concurrency",
+    # Data stores
+    "postgres": "PostgreSQL", "postgresql": "PostgreSQL", "mysql": "MySQL",
+    "sqlite": "SQLite", "mongodb": "MongoDB", "mongo": "MongoDB", "redis": "Redis",
+    "elasticsearch": "Elasticsearch", "kafka": "Kafka", "rabbitmq": "RabbitMQ",
+    "sqlalchemy": "SQLAlchemy", "prisma": "Prisma",
+    # DevOps / infra
+    "docker": "Docker", "dockerfile": "Docker", "kubernetes": "Kubernetes", "k8s": "Kubernetes",
+    "helm": "Helm", "terraform": "Terraform", "ansible": "Ansible", "aws": "AWS",
+    "gcp": "Google Cloud", "azure": "Azure", "ci/cd": "CI/CD",
+    "github actions": "GitHub Actions", "jenkins": "Jenkins", "nginx": "Nginx",
+    "cmake": "CMake", "makefile": "Make", "gradle": "Gradle", "maven": "Maven",
+    "npm": "npm", "yarn": "Yarn", "pnpm": "pnpm",
+    # Testing / quality
+    "pytest": "pytest", "jest": "Jest", "mocha": "Mocha", "cypress": "Cypress",
+    "playwright": "Playwright", "selenium": "Selenium", "mypy": "Type Annotations",
+    # Security
+    "xss": "Web Security", "csrf": "Web Security", "tls": "TLS", "ssl": "TLS",
+    # Data / ML
+    "machine learning": "Machine Learning",
+    "pytorch": "PyTorch", "torch": "PyTorch", "tensorflow": "TensorFlow", "keras": "Keras",
+    "numpy": "NumPy", "pandas": "pandas", "scikit-learn": "scikit-learn", "sklearn": "scikit-learn",
+    "jupyter": "Jupyter", "llm": "LLMs", "nlp": "NLP", "cuda": "CUDA",
+    "etl": "Data Engineering", "spark": "Apache Spark",
+    "matplotlib": "Data Visualization", "d3": "D3.js",
+    # Mobile / desktop
+    "android": "Android", "ios": "iOS", "react native": "React Native", "flutter": "Flutter",
+    "electron": "Electron", "tauri": "Tauri", "expo": "Expo",
+    # Misc
+    "browser extension": "Browser Extensions",
+    "blockchain": "Blockchain", "solidity": "Solidity", "ethereum": "Ethereum",
+}
+
+# Keywords that are also everyday English words ("react to", "swift fix").
+# Like _TECH_README_EXCLUDED for the tech stack, they only count when written
+# as a name: capitalized ("React") or as code ("`react`")
+_SKILL_AMBIGUOUS = frozenset([
+    "react", "express", "spring", "bootstrap", "swift", "spark", "rust", "rails",
+    "expo", "helm", "jest", "mocha", "electron", "flask", "torch", "babel",
+    "prettier", "julia", "dart", "yarn",
+])
+
+# One alternation over all keywords (longest first so "react native" wins over
+# "react"); the lookarounds act as word boundaries that also work for
+# keywords like "c++", "c#" and ".net"
+_SKILL_KEYWORD_RE = re.compile(
+    r'(?<![\w.+#])(?:'
+    + '|'.join(map(re.escape, sorted(_SKILL_KEYWORDS, key=len, reverse=True)))
+    + r')(?![\w+#])',
+    re.IGNORECASE
+)
+
+# Keyword -> (category, name) map for reading a tech stack off GitHub
+# metadata and the README without an LLM call
+_TECH_KEYWORDS = {
+    # Languages
+    "python": ("languages", "Python"), "javascript": ("languages", "JavaScript"),
+    "typescript": ("languages", "TypeScript"), "java": ("languages", "Java"),
+    "kotlin": ("languages", "Kotlin"), "swift": ("languages", "Swift"),
+    "go": ("languages", "Go"), "golang": ("languages", "Go"), "rust": ("languages", "Rust"),
+    "ruby": ("languages", "Ruby"), "php": ("languages", "PHP"), "c++": ("languages", "C++"),
+    "cpp": ("languages", "C++"), "c#": ("languages", "C#"), "csharp": ("languages", "C#"),
+    "scala": ("languages", "Scala"), "elixir": ("languages", "Elixir"), "dart": ("languages", "Dart"),
+    "lua": ("languages", "Lua"), "r": ("languages", "R"), "julia": ("languages", "Julia"),
+    "haskell": ("languages", "Haskell"), "shell": ("languages", "Shell"), "html": ("languages", "HTML"),
+    "css": ("languages", "CSS"), "solidity": ("languages", "Solidity"), "zig": ("languages", "Zig"),
+    # Frameworks and libraries
+    "react": ("frameworks", "React"), "react native": ("frameworks", "React Native"),
+    "next.js": ("frameworks", "Next.js"), "nextjs": ("frameworks", "Next.js"),
+    "vue": ("frameworks", "Vue"), "vuejs": ("frameworks", "Vue"), "nuxt": ("frameworks", "Nuxt"),
+    "angular": ("frameworks", "Angular"), "svelte": ("frameworks", "Svelte"),
+    "sveltekit": ("frameworks", "SvelteKit"), "tailwind": ("frameworks", "Tailwind CSS"),
+    "tailwindcss": ("frameworks", "Tailwind CSS"), "redux": ("frameworks", "Redux"),
+    "express": ("frameworks", "Express"), "nestjs": ("frameworks", "NestJS"),
+    "node.js": ("frameworks", "Node.js"), "nodejs": ("frameworks", "Node.js"),
+    "django": ("frameworks", "Django"), "flask": ("frameworks", "Flask"),
+    "fastapi": ("frameworks", "FastAPI"), "pydantic": ("frameworks", "Pydantic"),
+    "sqlalchemy": ("frameworks", "SQLAlchemy"), "rails": ("frameworks", "Ruby on Rails"),
+    "spring": ("frameworks", "Spring"), "spring boot": ("frameworks", "Spring Boot"),
+    "laravel": ("frameworks", "Laravel"), ".net": ("frameworks", ".NET"),
+    "flutter": ("frameworks", "Flutter"), "electron": ("frameworks", "Electron"),
+    "tauri": ("frameworks", "Tauri"), "pytorch": ("frameworks", "PyTorch"),
+    "tensorflow": ("frameworks", "TensorFlow"), "keras": ("frameworks", "Keras"),
+    "scikit-learn": ("frameworks", "scikit-learn"), "numpy": ("frameworks", "NumPy"),
+    "pandas": ("frameworks", "pandas"), "langchain": ("frameworks", "LangChain"),
+    "transformers": ("frameworks", "Transformers"), "graphql": ("frameworks", "GraphQL"),
+    "tokio": ("frameworks", "Tokio"), "gin": ("frameworks", "Gin"), "jquery": ("frameworks", "jQuery"),
+    "bootstrap": ("frameworks", "Bootstrap"), "three.js": ("frameworks", "three.js"),
+    # Tools and infrastructure
+    "docker": ("tools", "Docker"), "docker-compose": ("tools", "Docker Compose"),
+    "kubernetes": ("tools", "Kubernetes"), "k8s": ("tools", "Kubernetes"), "helm": ("tools", "Helm"),
+    "terraform": ("tools", "Terraform"), "ansible": ("tools", "Ansible"),
+    "webpack": ("tools", "Webpack"), "vite": ("tools", "Vite"), "babel": ("tools", "Babel"),
+    "eslint": ("tools", "ESLint"), "prettier": ("tools", "Prettier"), "jest": ("tools", "Jest"),
+    "vitest": ("tools", "Vitest"), "pytest": ("tools", "pytest"), "cypress": ("tools", "Cypress"),
+    "playwright": ("tools", "Playwright"), "storybook": ("tools", "Storybook"),
+    "npm": ("tools", "npm"), "yarn": ("tools", "Yarn"), "pnpm": ("tools", "pnpm"),
+    "poetry": ("tools", "Poetry"), "cargo": ("tools", "Cargo"), "gradle": ("tools", "Gradle"),
+    "maven": ("tools", "Maven"), "cmake": ("tools", "CMake"), "bazel": ("tools", "Bazel"),
+    "github actions": ("tools", "GitHub Actions"), "jenkins": ("tools", "Jenkins"),
+    "nginx": ("tools", "Nginx"), "postgresql": ("tools", "PostgreSQL"), "postgres": ("tools", "PostgreSQL"),
+    "mysql": ("tools", "MySQL"), "sqlite": ("tools", "SQLite"), "mongodb": ("tools", "MongoDB"),
+    "redis": ("tools", "Redis"), "elasticsearch": ("tools", "Elasticsearch"), "kafka": ("tools", "Kafka"),
+    "qdrant": ("tools", "Qdrant"), "aws": ("tools", "AWS"), "vercel": ("tools", "Vercel"),
+    "firebase": ("tools", "Firebase"), "supabase": ("tools", "Supabase"),
+}
+
+# README scan over _TECH_KEYWORDS. Single-letter and very common words
+# ("r", "go", "express", "spring", ...) are only trusted from metadata.
+_TECH_README_EXCLUDED = {"r", "go", "express", "spring", "gin", "cargo", "transformers", "shell", "rails", "poetry"}
+_TECH_KEYWORD_RE = re.compile(
+    r'(?<![\w.+#])(?:'
+    + '|'.join(map(re.escape, sorted(set(_TECH_KEYWORDS) - _TECH_README_EXCLUDED, key=len, reverse=True)))
+    + r')(?![\w+#])',
+    re.IGNORECASE
+)
+
+# Language/Topics lines of the indexed metadata document
+_METADATA_LANGUAGE_RE = re.compile(r'^Language: (.+)$', re.MULTILINE)
+_METADATA_TOPICS_RE = re.compile(r'^Topics: (.+)$', re.MULTILINE)
+
+# Static instructions, sent as the system message so the prompt prefix is
+# identical across calls; the per-call context goes in the user message
+_ANALYZE_SYSTEM_PROMPT = """You are a helpful assistant analyzing a GitHub repository.
+
+Based on the indexed repository context in the user's message, answer the user's question.
+When referencing information, cite the source number (e.g., "According to [1]...").
+
+Provide a clear, helpful answer. If referencing specific sections or files, mention them explicitly."""
+
+_SUGGEST_SYSTEM_PROMPT = """Suggest how a developer can contribute to this repository, based on the open issues in the user's message.
+
+Return a JSON object with these exact keys:
+{
+    "summary": "2-3 sentence overview of what this project is and current contribution opportunities",
+    "beginner_friendly": ["list", "of", "3-5", "beginner", "friendly", "tasks"],
+    "documentation": ["list", "of", "2-3", "documentation", "improvements"],
+    "bugs": ["list", "of", "3-5", "bugs", "to", "fix"],
+    "features": ["list", "of", "3-5", "features", "to", "implement"]
+}
+
+Be specific and actionable. Each item should be under 100 characters. Return ONLY valid JSON."""
+
+_CODE_REVIEW_SYSTEM_PROMPT = """You are a Senior Maintainer reviewing a pull request. Be helpful but thorough.
+
+Provide a code review of the user's code with:
+1. CRITICAL issues (must fix before merge) - security, bugs, logic errors
+2. SUGGESTIONS (optional improvements) - style, readability, best practices
+3. POSITIVE feedback (what's good about this code)
+
+Return a JSON object:
+{
+    "verdict": "approve" | "request_changes" | "comment",
+    "critical": [
+        {"line": "approximate line or code snippet", "issue": "description", "fix": "suggested fix"}
+    ],
+    "suggestions": [
+        {"line": "code snippet", "suggestion": "improvement idea"}
+    ],
+    "praise": ["list", "of", "positive", "aspects"],
+    "summary": "Overall review summary in 1-2 sentences"
+}
+
+Be constructive and educational. Explain WHY something is an issue.
+Return ONLY valid JSON."""
+
+# Fields requested from the LLM for an issue skill analysis
+_ISSUE_SKILLS_SCHEMA = """{
+    "skills": ["list", "of", "3-5", "specific", "skills"],
+    "difficulty": "beginner" | "intermediate" | "advanced",
+    "time_estimate": "30 mins" | "1-2 hours" | "half day" | "1 day" | "2+ days",
+    "skill_level": 1-10,
+    "summary": "One sentence describing what this issue needs"
+}"""
+
+# Time estimate per difficulty score
+_TIME_ESTIMATES = {
+    1: "30 mins", 2: "1 hour", 3: "2 hours",
+    4: "3 hours", 5: "4 hours", 6: "6 hours",
+    7: "8 hours", 8: "1-2 days", 9: "2-3 days", 10: "1 week+"
+}
+
+
+def _keyword_skills(text: str, limit: int = 4) -> List[str]:
+    """Distinct skills whose keywords appear in text, in order of first mention."""
+    skills = []
+    for match in _SKILL_KEYWORD_RE.finditer(text):
+        keyword = match.group()
+        if keyword.lower() in _SKILL_AMBIGUOUS and not (
+            keyword[0].isupper() or text[match.start() - 1:match.start()] == "`"
+        ):
+            continue
+        skill = _SKILL_KEYWORDS[keyword.lower()]
+        if skill not in skills:
+            skills.append(skill)
+            if len(skills) == limit:
+                break
+    return skills
+
+
+def _detect_tech_stack(metadata: str, readme: str) -> Dict[str, List[str]]:
+    """
+    Tech stack from GitHub's language/topics (authoritative) plus framework
+    and tool keywords mentioned in the README.
+    """
+    stack = {"languages": [], "frameworks": [], "tools": []}
+    
+    def add(category: str, name: str) -> None:
+        if name not in stack[category]:
+            stack[category].append(name)
+    
+    language = _METADATA_LANGUAGE_RE.search(metadata)
+    if language and language.group(1) != "Not specified":
+        add("languages", language.group(1).strip())
+    
+    topics = _METADATA_TOPICS_RE.search(metadata)
+    for topic in (topics.group(1).split(",") if topics else []):
+        # Topics are slugs ("react-native"), keywords use spaces
+        match = _TECH_KEYWORDS.get(topic.strip().lower()) or _TECH_KEYWORDS.get(topic.strip().lower().replace("-", " "))
+        if match:
+            add(*match)
+    
+    for keyword in _TECH_KEYWORD_RE.findall(readme):
+        add(*_TECH_KEYWORDS[keyword.lower()])
+    
+    return stack
+
+
+def _label_delta(labels: List[str]) -> int:
+    """Score adjustment from labels: -2 per easy label, +2 per hard label."""
+    delta = 0
+    for label in labels:
+        label_lower = label.lower()
+        if _EASY_LABEL_RE.search(label_lower):
+            delta -= 2
+        if _HARD_LABEL_RE.search(label_lower):
+            delta += 2
+    return delta
+
+
+def _difficulty_scores(label_deltas: np.ndarray, content_lengths: np.ndarray) -> np.ndarray:
+    """
+    Numeric difficulty kernel over N issues at once.
+    Starts from 5, applies label deltas, then -1 for short (<200 chars) and
+    +1 for long (>1000 chars) issues, clamped to 1-10.
+    """
+    scores = 5 + label_deltas
+    scores -= content_lengths < 200  # Short issues often simpler
+    scores += content_lengths > 1000  # Long issues often complex
+    return np.clip(scores, 1, 10)
+
+
+def _load_json(response: str, expected: type):
+    """
+    Parse a JSON object (expected=dict) or array (expected=list) from an LLM
+    response. JSON-mode responses parse directly; otherwise the outermost
+    bracketed span is parsed. Returns None if the response has none.
+    """
+    try:
+        result = orjson.loads(response)
+        if isinstance(result, expected):
+            return result
+    except orjson.JSONDecodeError:
+        pass
+    match = (_JSON_OBJ_RE if expected is dict else _JSON_ARR_RE).search(response)
+    return orjson.loads(match.group()) if match else None
+
+
+def _parses_json(response: str, expected: type) -> bool:
+    """Whether _load_json finds a JSON value of the expected type in response."""
+    try:
+        return _load_json(response, expected) is not None
+    except orjson.JSONDecodeError:
+        return False
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> Optional["tiktoken.Encoding"]:
+    """Load the tokenizer once; None if it can't be loaded (e.g. offline)."""
+    try:
+        return tiktoken.get_encoding(_TOKEN_ENCODING)
+    except Exception as e:
+        logger.warning(f"[Analyzer] Tokenizer unavailable, truncating by characters: {e}")
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _token_prefix(text: str, max_tokens: int) -> Tuple[str, int]:
+    """First max_tokens tokens of text and their count (cached per text)."""
+    encoding = _encoding()
+    if encoding is None:
+        prefix = text[:max_tokens * 4]  # ~4 characters per token
+        return prefix, (len(prefix) + 3) // 4
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text, len(tokens)
+    return encoding.decode(tokens[:max_tokens]), max_tokens
+
+
+def _truncate_tokens(text: str, max_tokens: int) -> str:
+    """Truncate text to at most max_tokens tokens."""
+    return _token_prefix(text, max_tokens)[0]
+
+
+def _simhash(text: str) -> int:
+    """64-bit SimHash over word trigrams of whitespace-normalized text."""
+    words = text.lower().split()
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+    weights = [0] * 64
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def _dedupe_documents(docs: List[Dict]) -> List[Dict]:
+    """
+    Drop documents that are near-duplicates of a higher-ranked one. Parent
+    documents (the full README added for context) are always kept, since
+    only their opening overlaps with the section that pulled them in.
+    """
+    kept = []
+    fingerprints = []
+    for doc in docs:
+        if doc.get('is_parent'):
+            kept.append(doc)
+            continue
+        fingerprint = _simhash(doc['content'][:500])
+        if all(bin(fingerprint ^ f).count("1") > _SIMHASH_MAX_DISTANCE for f in fingerprints):
+            kept.append(doc)
+            fingerprints.append(fingerprint)
+    return kept
+
+
+def _take_json_object(chunks: Iterator[str]) -> str:
+    """
+    Concatenate streamed text up to the end of the first complete top-level
+    JSON object and stop consuming chunks there. Text before the object is
+    kept; if no object closes, everything is returned.
+    """
+    parts = []
+    depth = 0
+    in_string = escaped = False
+    for chunk in chunks:
+        for i, ch in enumerate(chunk):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"' and depth:
+                in_string = True
+            elif ch == "{":
+                depth += 1
+            elif ch == "}" and depth:
+                depth -= 1
+                if depth == 0:
+                    parts.append(chunk[:i + 1])
+                    return "".join(parts)
+        parts.append(chunk)
+    return "".join(parts)
+
 
 class RepositoryAnalyzer:
     """Analyze repositories and suggest contributions using RAG + LLM."""
@@ -38,69 +551,331 @@ class RepositoryAnalyzer:
             logger.info("[Analyzer] Using HuggingFace with Llama 3.2")
         else:
             raise ValueError("Either GROQ_API_KEY or HUGGINGFACEHUB_API_TOKEN is required")
-    
-    def _generate(self, prompt: str, max_tokens: int = 1024) -> str:
-        """Generate text using the configured LLM provider."""
         
+        # Request pieces that never change between calls
         if self.provider == "groq":
-            return self._generate_groq(prompt, max_tokens)
+            self._url = "https://api.groq.com/openai/v1/chat/completions"
+            token = self.groq_key
         else:
-            return self._generate_hf(prompt, max_tokens)
+            self._url = f"https://router.huggingface.co/hf-inference/models/{self.model}/v1/chat/completions"
+            token = self.hf_token
+        self._headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+        
+        # Repo-level results (tech stack, setup, warmth) keyed by the repo's
+        # index version, so they are recomputed only after a re-index
+        self._repo_cache = LRUCache(maxsize=1024)
+        self._repo_cache_lock = threading.Lock()
+        
+        # Vector search results, so the fixed queries several methods issue
+        # per repo (metadata, readme, issues) hit Qdrant once per index version
+        self._search_cache = LRUCache(maxsize=512)
+        self._search_cache_lock = threading.Lock()
+        
+        # Runs independent searches of one method side by side
+        self._search_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="analyzer-search")
+        
+        # Exact-match completion cache: memory tier in front of a disk tier
+        # that survives restarts (diskcache is thread- and process-safe)
+        self._llm_cache = TTLCache(maxsize=1024, ttl=_LLM_CACHE_TTL)
+        self._llm_cache_lock = threading.Lock()
+        self._llm_disk_cache = Cache(_LLM_CACHE_DIR)
     
-    def _generate_groq(self, prompt: str, max_tokens: int = 1024) -> str:
-        """Generate using Groq API."""
-        url = "https://api.groq.com/openai/v1/chat/completions"
+    def _repo_cache_key(self, kind: str, repo_name: str) -> Tuple:
+        return (kind, repo_name, self.rag.index_version(repo_name))
+    
+    def _get_repo_cached(self, key: Tuple) -> Optional[Dict]:
+        with self._repo_cache_lock:
+            result = self._repo_cache.get(key)
+        return copy.deepcopy(result) if result is not None else None
+    
+    def _set_repo_cached(self, key: Tuple, result: Dict) -> None:
+        with self._repo_cache_lock:
+            self._repo_cache[key] = copy.deepcopy(result)
+    
+    def _search(
+        self,
+        query: str,
+        repo_name: str,
+        top_k: int = 5,
+        doc_type: Optional[str] = None
+    ) -> List[Dict]:
+        """rag.search(), memoized until the repo is re-indexed."""
+        key = (query, repo_name, top_k, doc_type, self.rag.index_version(repo_name))
+        with self._search_cache_lock:
+            results = self._search_cache.get(key)
+        if results is None:
+            results = self.rag.search(query=query, repo_name=repo_name, top_k=top_k, doc_type=doc_type)
+            with self._search_cache_lock:
+                self._search_cache[key] = results
+        return copy.deepcopy(results)
+    
+    def _repo_context(self, repo_name: str) -> Dict[str, str]:
+        """
+        Metadata, README head, README setup section and file tree for a repo,
+        fetched once per index version. Repo-level prompts share this as their system prompt
+        prefix so it is byte-identical across methods and hits the
+        provider's prompt cache.
+        """
+        cache_key = self._repo_cache_key("context", repo_name)
+        cached = self._get_repo_cached(cache_key)
+        if cached is not None:
+            return cached
         
-        headers = {
-            "Authorization": f"Bearer {self.groq_key}",
-            "Content-Type": "application/json"
+        futures = {
+            part: self._search_pool.submit(
+                self._search,
+                query=query,
+                repo_name=repo_name,
+                doc_type=doc_type,
+                top_k=1
+            )
+            for part, (query, doc_type, _) in _REPO_CONTEXT_PARTS.items()
         }
+        context = {}
+        for part, future in futures.items():
+            results = future.result()
+            context[part] = (
+                _truncate_tokens(results[0]['content'], _REPO_CONTEXT_PARTS[part][2]) if results else ""
+            )
+        # Short READMEs: the setup section is already inside the head
+        if context["readme_setup"] and context["readme_setup"].strip() in context["readme_full"]:
+            context["readme_setup"] = ""
+        
+        self._set_repo_cached(cache_key, context)
+        return context
+    
+    @staticmethod
+    def _repo_system_prompt(context: Dict[str, str], instructions: str = "") -> str:
+        """System prompt with the repo context block first, then instructions."""
+        sections = [
+            ("METADATA", context["metadata"]),
+            ("README", context["readme_full"]),
+            ("README SETUP SECTION", context["readme_setup"]),
+            ("FILE STRUCTURE", context["file_tree"]),
+        ]
+        block = "\n\n".join(f"{title}:\n{text}" for title, text in sections if text)
+        return f"REPOSITORY CONTEXT:\n{block}\n\n{instructions}".rstrip()
+    
+    @staticmethod
+    def _messages(prompt: str, system: Optional[str]) -> List[Dict]:
+        """
+        Chat messages for a prompt. Static instructions go in the system
+        message so the request prefix is byte-identical across calls and
+        can hit the provider's prompt cache.
+        """
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        return messages
+    
+    def _generate(
+        self,
+        prompt: str,
+        max_tokens: int = 1024,
+        system: Optional[str] = None,
+        json_mode: bool = False,
+        expect: Optional[type] = None
+    ) -> str:
+        """
+        Generate text using the configured LLM provider, serving repeats from cache.
+        json_mode asks the provider to emit a single JSON object (Groq only;
+        the prompt must still describe the expected JSON). On other providers
+        JSON completions are streamed and the read stops as soon as the
+        object closes, so trailing prose is neither waited for nor decoded.
+        When the caller parses the reply as JSON (expect=dict/list, implied
+        dict by json_mode), only replies that parse are cached, and cached
+        replies that don't are dropped and regenerated.
+        """
+        key = hashlib.sha256(
+            f"{self.provider}|{self.model}|{max_tokens}|{_LLM_TEMPERATURE}|{json_mode}|{system or ''}|{prompt}".encode()
+        ).hexdigest()
+        
+        if json_mode:
+            expect = dict
+        
+        with self._llm_cache_lock:
+            cached = self._llm_cache.get(key)
+        if cached is None:
+            cached = self._llm_disk_cache.get(key)
+            if cached is not None:
+                with self._llm_cache_lock:
+                    self._llm_cache[key] = cached
+        if cached is not None:
+            if expect is None or _parses_json(cached, expect):
+                return cached
+            self._evict_generated(key)
         
+        if self.provider == "groq":
+            # Groq's JSON mode doesn't support streaming
+            text = self._generate_groq(prompt, max_tokens, system, json_mode=json_mode)
+        elif json_mode:
+            stream = self._generate_stream(prompt, max_tokens, system, json_mode=True)
+            try:
+                text = _take_json_object(stream).strip()
+            finally:
+                stream.close()  # Drops the connection if the object closed early
+        else:
+            text = self._generate_hf(prompt, max_tokens, system)
+        
+        # Truncated or malformed JSON would otherwise replay from the disk
+        # cache for a week; callers fall back and the next call retries
+        if expect is None or _parses_json(text, expect):
+            with self._llm_cache_lock:
+                self._llm_cache[key] = text
+            self._llm_disk_cache.set(key, text, expire=_LLM_CACHE_TTL)
+        return text
+    
+    def _evict_generated(self, key: str):
+        with self._llm_cache_lock:
+            self._llm_cache.pop(key, None)
+        self._llm_disk_cache.delete(key)
+    
+    def _generate_groq(
+        self,
+        prompt: str,
+        max_tokens: int = 1024,
+        system: Optional[str] = None,
+        json_mode: bool = False
+    ) -> str:
+        """Generate using Groq API."""
         data = {
             "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
+            "messages": self._messages(prompt, system),
             "max_tokens": max_tokens,
-            "temperature": 0.3
+            "temperature": _LLM_TEMPERATURE
         }
+        if json_mode:
+            data["response_format"] = {"type": "json_object"}
         
         try:
-            response = requests.post(url, headers=headers, json=data, timeout=60)
+            response = _post(self._url, headers=self._headers, json=data)
             response.raise_for_status()
-            result = response.json()
+            result = orjson.loads(response.content)
             return result["choices"][0]["message"]["content"].strip()
         except Exception as e:
             logger.error(f"[Analyzer] Groq generation failed: {e}")
             raise ValueError(f"AI generation failed: {e}")
     
-    def _generate_hf(self, prompt: str, max_tokens: int = 1024) -> str:
+    def _generate_hf(self, prompt: str, max_tokens: int = 1024, system: Optional[str] = None) -> str:
         """Generate using HuggingFace Inference API (new router)."""
-        url = f"https://router.huggingface.co/hf-inference/models/{self.model}/v1/chat/completions"
-        
-        headers = {
-            "Authorization": f"Bearer {self.hf_token}",
-            "Content-Type": "application/json"
-        }
-        
         data = {
-            "messages": [{"role": "user", "content": prompt}],
+            "messages": self._messages(prompt, system),
             "max_tokens": max_tokens,
-            "temperature": 0.3
+            "temperature": _LLM_TEMPERATURE
         }
         
         try:
-            response = requests.post(url, headers=headers, json=data, timeout=60)
+            response = _post(self._url, headers=self._headers, json=data)
             response.raise_for_status()
-            result = response.json()
+            result = orjson.loads(response.content)
             return result["choices"][0]["message"]["content"].strip()
         except Exception as e:
             logger.error(f"[Analyzer] HuggingFace generation failed: {e}")
             raise ValueError(f"AI generation failed: {e}")
     
+    def _generate_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 1024,
+        system: Optional[str] = None,
+        json_mode: bool = False
+    ) -> Iterator[str]:
+        """
+        Generate text, yielding content chunks as the provider streams them.
+        json_mode is ignored on Groq, whose JSON mode doesn't support
+        streaming; the prompt still asks for JSON.
+        """
+        data = {
+            "messages": self._messages(prompt, system),
+            "max_tokens": max_tokens,
+            "temperature": _LLM_TEMPERATURE,
+            "stream": True
+        }
+        if self.provider == "groq":
+            data["model"] = self.model
+        
+        try:
+            with _post_stream(self._url, headers=self._headers, json=data) as response:
+                response.raise_for_status()
+                # OpenAI-compatible SSE: "data: {chunk}" lines, ending with "data: [DONE]"
+                for line in response.iter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    payload = line[len("data: "):]
+                    if payload == "[DONE]":
+                        break
+                    delta = orjson.loads(payload)["choices"][0]["delta"].get("content")
+                    if delta:
+                        yield delta
+        except Exception as e:
+            logger.error(f"[Analyzer] Streaming generation failed: {e}")
+            raise ValueError(f"AI generation failed: {e}")
+    
     def analyze(self, repo_name: str, question: str) -> Dict:
         """
         Answer a question about a repository using advanced RAG.
         Uses HyDE for better retrieval and parent-document context.
+        Semantically equivalent questions are served from the answer cache.
         """
+        # Only the question is embedded for the cache lookup; the prompt
+        # itself carries retrieved context that varies between calls
+        question_vector = self.rag.embed_text(question)
+        cached = self.rag.get_cached_answer(repo_name, question, vector=question_vector)
+        if cached:
+            return cached
+        
+        prepared = self._prepare_analysis(repo_name, question)
+        if prepared is None:
+            return {
+                "answer": "I don't have enough information about this repository. Please make sure it has been indexed.",
+                "sources": []
+            }
+        
+        prompt, sources = prepared
+        answer = self._generate(prompt, system=_ANALYZE_SYSTEM_PROMPT)
+        
+        result = {
+            "answer": answer,
+            "sources": sources
+        }
+        self.rag.cache_answer(repo_name, question, result, vector=question_vector)
+        return result
+    
+    def analyze_stream(self, repo_name: str, question: str) -> Iterator[Dict]:
+        """
+        Streaming variant of analyze().
+        Yields {"sources": [...]} first, then {"delta": "..."} chunks of the answer.
+        """
+        question_vector = self.rag.embed_text(question)
+        cached = self.rag.get_cached_answer(repo_name, question, vector=question_vector)
+        if cached:
+            yield {"sources": cached["sources"]}
+            yield {"delta": cached["answer"]}
+            return
+        
+        prepared = self._prepare_analysis(repo_name, question)
+        if prepared is None:
+            yield {"sources": []}
+            yield {"delta": "I don't have enough information about this repository. Please make sure it has been indexed."}
+            return
+        
+        prompt, sources = prepared
+        yield {"sources": sources}
+        chunks = []
+        for chunk in self._generate_stream(prompt, system=_ANALYZE_SYSTEM_PROMPT):
+            chunks.append(chunk)
+            yield {"delta": chunk}
+        
+        self.rag.cache_answer(
+            repo_name, question,
+            {"answer": "".join(chunks), "sources": sources},
+            vector=question_vector
+        )
+    
+    def _prepare_analysis(self, repo_name: str, question: str) -> Optional[Tuple[str, List[Dict]]]:
+        """Retrieve context for a question and build the (prompt, sources) pair."""
         # Use context-aware search with HyDE
         results = self.rag.search_with_context(
             query=question, 
@@ -109,15 +884,19 @@ class RepositoryAnalyzer:
         )
         
         if not results:
-            return {
-                "answer": "I don't have enough information about this repository. Please make sure it has been indexed.",
-                "sources": []
-            }
+            return None
         
-        # Build context from search results with citations
+        results = _dedupe_documents(results)
+        
+        # Build context from search results with citations, packing documents
+        # in rank order until the token budget is spent
         context_parts = []
         sources = []
+        budget = _ANALYZE_CONTEXT_TOKENS
         for i, doc in enumerate(results, 1):
+            if budget <= 0:
+                break
+            
             # Build citation info
             section_info = ""
             if doc['type'] == 'readme':
@@ -127,7 +906,9 @@ class RepositoryAnalyzer:
             elif doc['type'] == 'file_tree':
                 section_info = " (File Structure)"
             
-            context_parts.append(f"[{i}] {doc['type'].upper()}{section_info}:\n{doc['content'][:600]}")
+            snippet, used = _token_prefix(doc['content'], min(_ANALYZE_DOC_TOKENS, budget))
+            budget -= used
+            context_parts.append(f"[{i}] {doc['type'].upper()}{section_info}:\n{snippet}")
             
             sources.append({
                 "type": doc['type'],
@@ -139,44 +920,27 @@ class RepositoryAnalyzer:
         
         context = "\n\n".join(context_parts)
         
-        prompt = f"""You are a helpful assistant analyzing a GitHub repository.
-
-Based on the following indexed information, answer the user's question.
-When referencing information, cite the source number (e.g., "According to [1]...").
-
-REPOSITORY CONTEXT:
+        prompt = f"""REPOSITORY CONTEXT:
 {context}
 
-USER QUESTION: {question}
+USER QUESTION: {question}"""
 
-Provide a clear, helpful answer. If referencing specific sections or files, mention them explicitly."""
-
-        answer = self._generate(prompt)
-        
-        return {
-            "answer": answer,
-            "sources": sources
-        }
+        return prompt, sources
     
     def suggest_contributions(self, repo_name: str) -> Dict:
         """
         Analyze repository and suggest ways to contribute.
         """
-        # Get repository metadata
-        metadata_results = self.rag.search(
-            query="repository description language topics",
-            repo_name=repo_name,
-            doc_type="metadata",
-            top_k=1
-        )
-        
-        # Get all issues
-        all_issues_results = self.rag.search(
+        # Get all issues (in the background, alongside the repo context fetch)
+        issues_future = self._search_pool.submit(
+            self._search,
             query="issue bug feature documentation help",
             repo_name=repo_name,
             doc_type="issue",
             top_k=15
         )
+        context = self._repo_context(repo_name)
+        all_issues_results = issues_future.result()
         
         if not all_issues_results:
             return {
@@ -187,35 +951,21 @@ Provide a clear, helpful answer. If referencing specific sections or files, ment
                 "features": []
             }
         
-        issues_text = "\n\n".join([f"- {doc['content'][:400]}" for doc in all_issues_results[:10]])
-        repo_info = metadata_results[0]['content'] if metadata_results else repo_name
+        issues_text = "\n\n".join([f"- {_truncate_tokens(doc['content'], 120)}" for doc in all_issues_results[:10]])
         
-        prompt = f"""Analyze this GitHub repository and suggest how a developer can contribute.
-
-REPOSITORY INFO:
-{repo_info}
-
-OPEN ISSUES:
-{issues_text}
-
-Return a JSON object with these exact keys:
-{{
-    "summary": "2-3 sentence overview of what this project is and current contribution opportunities",
-    "beginner_friendly": ["list", "of", "3-5", "beginner", "friendly", "tasks"],
-    "documentation": ["list", "of", "2-3", "documentation", "improvements"],
-    "bugs": ["list", "of", "3-5", "bugs", "to", "fix"],
-    "features": ["list", "of", "3-5", "features", "to", "implement"]
-}}
-
-Be specific and actionable. Each item should be under 100 characters. Return ONLY valid JSON."""
+        prompt = f"""OPEN ISSUES:
+{issues_text}"""
 
         try:
-            response = self._generate(prompt, max_tokens=1500)
+            response = self._generate(
+                prompt,
+                max_tokens=1500,
+                system=self._repo_system_prompt(context, _SUGGEST_SYSTEM_PROMPT),
+                json_mode=True
+            )
             
-            # Extract JSON from response
-            json_match = re.search(r'\{[\s\S]*\}', response)
-            if json_match:
-                suggestions = json.loads(json_match.group())
+            suggestions = _load_json(response, dict)
+            if suggestions is not None:
                 return suggestions
             else:
                 return {
@@ -225,14 +975,14 @@ Be specific and actionable. Each item should be under 100 characters. Return ONL
                     "bugs": [],
                     "features": []
                 }
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             logger.warning("[Analyzer] Failed to parse JSON, using fallback")
-            return self._fallback_suggestions(repo_name, all_issues_results, metadata_results)
+            return self._fallback_suggestions(repo_name, all_issues_results)
         except Exception as e:
             logger.error(f"[Analyzer] Failed to generate suggestions: {e}")
-            return self._fallback_suggestions(repo_name, all_issues_results, metadata_results)
+            return self._fallback_suggestions(repo_name, all_issues_results)
     
-    def _fallback_suggestions(self, repo_name: str, issues: List[Dict], metadata: List[Dict]) -> Dict:
+    def _fallback_suggestions(self, repo_name: str, issues: List[Dict]) -> Dict:
         """Generate suggestions without LLM using search results."""
         return {
             "summary": f"Repository: {repo_name}. Found {len(issues)} open issues to analyze.",
@@ -247,7 +997,7 @@ Be specific and actionable. Each item should be under 100 characters. Return ONL
     
     def get_issue_details(self, repo_name: str, issue_number: int) -> Optional[Dict]:
         """Get detailed information about a specific issue."""
-        results = self.rag.search(
+        results = self._search(
             query=f"Issue #{issue_number}",
             repo_name=repo_name,
             doc_type="issue",
@@ -268,49 +1018,43 @@ Be specific and actionable. Each item should be under 100 characters. Return ONL
         Detect the technology stack of a repository.
         Returns technologies, languages, and frameworks.
         """
-        # Get README and metadata
-        readme_results = self.rag.search(
-            query="dependencies requirements technology stack framework library",
-            repo_name=repo_name,
-            doc_type="readme",
-            top_k=1
-        )
+        cache_key = self._repo_cache_key("tech_stack", repo_name)
+        cached = self._get_repo_cached(cache_key)
+        if cached is not None:
+            return cached
         
-        metadata_results = self.rag.search(
-            query="language topics",
-            repo_name=repo_name,
-            doc_type="metadata",
-            top_k=1
-        )
-        
-        context = ""
-        if readme_results:
-            context += readme_results[0]['content'][:2000]
-        if metadata_results:
-            context += "\n" + metadata_results[0]['content'][:500]
-        
-        if not context:
+        context = self._repo_context(repo_name)
+        if not (context["readme_full"] or context["metadata"]):
             return {"languages": [], "frameworks": [], "tools": []}
         
-        prompt = f"""Analyze this repository and extract the tech stack.
-
-REPOSITORY INFO:
-{context}
+        # Metadata and README keywords are usually enough; the LLM is only
+        # needed for repos with sparse metadata and an unhelpful README
+        stack = _detect_tech_stack(
+            context["metadata"], f'{context["readme_full"]}\n{context["readme_setup"]}'
+        )
+        if sum(map(len, stack.values())) >= 3:
+            self._set_repo_cached(cache_key, stack)
+            return stack
+        
+        prompt = """Analyze this repository and extract the tech stack.
 
 Return a JSON object with:
-{{
+{
     "languages": ["list", "of", "programming", "languages"],
     "frameworks": ["list", "of", "frameworks", "and", "libraries"],
     "tools": ["list", "of", "dev", "tools", "like", "docker", "webpack"]
-}}
+}
 
 Only include technologies actually used. Return ONLY valid JSON."""
 
         try:
-            response = self._generate(prompt, max_tokens=500)
-            json_match = re.search(r'\{[\s\S]*\}', response)
-            if json_match:
-                return json.loads(json_match.group())
+            response = self._generate(
+                prompt, max_tokens=500, system=self._repo_system_prompt(context), json_mode=True
+            )
+            result = _load_json(response, dict)
+            if result is not None:
+                self._set_repo_cached(cache_key, result)
+                return result
         except Exception as e:
             logger.warning(f"[Analyzer] Tech stack detection failed: {e}")
         
@@ -321,59 +1065,103 @@ Only include technologies actually used. Return ONLY valid JSON."""
         Calculate difficulty score for an issue.
         Returns score (1-10), time estimate, and required skills.
         """
-        # Check for easy indicators in labels
-        easy_labels = ['good first issue', 'beginner', 'easy', 'starter', 'help wanted']
-        hard_labels = ['complex', 'hard', 'expert', 'breaking change', 'architecture']
-        
-        base_score = 5
-        
-        for label in labels:
-            label_lower = label.lower()
-            if any(easy in label_lower for easy in easy_labels):
-                base_score -= 2
-            if any(hard in label_lower for hard in hard_labels):
-                base_score += 2
-        
-        # Estimate based on content length
-        content_length = len(issue_title) + len(issue_body)
-        if content_length < 200:
-            base_score -= 1  # Short issues often simpler
-        elif content_length > 1000:
-            base_score += 1  # Long issues often complex
-        
-        # Clamp score
-        score = max(1, min(10, base_score))
-        
-        # Time estimate mapping
-        time_map = {
-            1: "30 mins", 2: "1 hour", 3: "2 hours",
-            4: "3 hours", 5: "4 hours", 6: "6 hours",
-            7: "8 hours", 8: "1-2 days", 9: "2-3 days", 10: "1 week+"
-        }
+        return self.calculate_difficulty_batch([issue_title], [issue_body], [labels])[0]
+
+    def calculate_difficulty_batch(
+        self,
+        titles: List[str],
+        bodies: List[str],
+        labels: List[List[str]]
+    ) -> List[Dict]:
+        """
+        Calculate difficulty for many issues at once.
+        Scores are computed in a single vectorized pass over all issues.
+        """
+        label_deltas = np.array([_label_delta(issue_labels) for issue_labels in labels], dtype=np.int64)
+        content_lengths = np.array([len(t) + len(b) for t, b in zip(titles, bodies)], dtype=np.int64)
+        scores = _difficulty_scores(label_deltas, content_lengths).tolist()
         
-        # Extract skills using LLM
+        return [
+            {
+                "score": score,
+                "time_estimate": _TIME_ESTIMATES.get(score, "Unknown"),
+                "required_skills": skills,
+                "level": "Beginner" if score <= 3 else "Intermediate" if score <= 6 else "Advanced"
+            }
+            for score, skills in zip(scores, self._extract_skills_batch(titles, bodies))
+        ]
+
+    def _extract_skills(self, issue_title: str, issue_body: str) -> List[str]:
+        """Extract 2-4 required skills for an issue using the LLM."""
         prompt = f"""Analyze this issue and list 2-4 skills needed to solve it.
 
 ISSUE: {issue_title}
-{issue_body[:500]}
+{_truncate_tokens(issue_body, 150)}
 
 Return a JSON array of skill names only: ["skill1", "skill2"]"""
 
         skills = []
         try:
-            response = self._generate(prompt, max_tokens=100)
-            json_match = re.search(r'\[[\s\S]*\]', response)
-            if json_match:
-                skills = json.loads(json_match.group())[:4]
+            response = self._generate(prompt, max_tokens=100, expect=list)
+            skills = (_load_json(response, list) or [])[:4]
         except Exception:
             pass
         
-        return {
-            "score": score,
-            "time_estimate": time_map.get(score, "Unknown"),
-            "required_skills": skills,
-            "level": "Beginner" if score <= 3 else "Intermediate" if score <= 6 else "Advanced"
-        }
+        return skills
+
+    def _extract_skills_batch(self, titles: List[str], bodies: List[str]) -> List[List[str]]:
+        """
+        Extract skills for many issues. The keyword taxonomy tags most issues
+        locally; only issues with fewer than 2 keyword matches go to the LLM.
+        """
+        skills = [_keyword_skills(f"{title}\n{body[:1000]}") for title, body in zip(titles, bodies)]
+        
+        missing = [i for i, issue_skills in enumerate(skills) if len(issue_skills) < 2]
+        if missing:
+            llm_skills = self._extract_skills_llm_batch(
+                [titles[i] for i in missing],
+                [bodies[i] for i in missing]
+            )
+            for i, issue_skills in zip(missing, llm_skills):
+                skills[i] = issue_skills or skills[i]
+        
+        return skills
+
+    def _extract_skills_llm_batch(self, titles: List[str], bodies: List[str]) -> List[List[str]]:
+        """
+        Extract skills with the LLM, asking about up to _ISSUE_BATCH_SIZE
+        issues per call. Falls back to per-issue calls for a batch whose
+        response doesn't have one entry per issue.
+        """
+        skills = []
+        for start in range(0, len(titles), _ISSUE_BATCH_SIZE):
+            batch = list(zip(titles[start:start + _ISSUE_BATCH_SIZE], bodies[start:start + _ISSUE_BATCH_SIZE]))
+            if len(batch) == 1:
+                skills.append(self._extract_skills(*batch[0]))
+                continue
+            
+            issues_text = "\n\n".join(
+                f"ISSUE {i}: {title}\n{_truncate_tokens(body, 150)}" for i, (title, body) in enumerate(batch, 1)
+            )
+            prompt = f"""Analyze these {len(batch)} issues and list 2-4 skills needed to solve each one.
+
+{issues_text}
+
+Return a JSON array with exactly {len(batch)} arrays of skill names, in issue order: [["skill1", "skill2"], ...]"""
+
+            parsed = None
+            try:
+                response = self._generate(prompt, max_tokens=60 * len(batch) + 40, expect=list)
+                parsed = _load_json(response, list)
+            except Exception:
+                pass
+            
+            if isinstance(parsed, list) and len(parsed) == len(batch) and all(isinstance(p, list) for p in parsed):
+                skills.extend(p[:4] for p in parsed)
+            else:
+                skills.extend(self._extract_skills(title, body) for title, body in batch)
+        
+        return skills
 
     def find_relevant_files(self, repo_name: str, issue_title: str, issue_body: str) -> List[Dict]:
         """
@@ -383,24 +1171,78 @@ Return a JSON array of skill names only: ["skill1", "skill2"]"""
         query = f"{issue_title} {issue_body[:300]}"
         
         # Search for related content
-        results = self.rag.search(
+        results = self._search(
             query=query,
             repo_name=repo_name,
             top_k=5
         )
         
-        # Extract file references from results
+        files = self._files_from_results(results)
+        
+        # If no specific files found, use LLM to guess
+        if not files and results:
+            files = self._guess_files(issue_title, issue_body)
+        
+        return files[:5]
+
+    def find_relevant_files_batch(self, repo_name: str, issues: List[Tuple[str, str]]) -> List[List[Dict]]:
+        """
+        find_relevant_files() for many (title, body) issues of one repo.
+        All queries are embedded and searched in one batch, and the issues
+        with no file paths in their results share one LLM fallback call.
+        """
+        batch_results = self.rag.search_batch(
+            [f"{title} {body[:300]}" for title, body in issues],
+            repo_name=repo_name,
+            top_k=5
+        )
+        files = [self._files_from_results(results) for results in batch_results]
+        
+        residual = [i for i, (item_files, results) in enumerate(zip(files, batch_results))
+                    if not item_files and results]
+        for start in range(0, len(residual), _ISSUE_BATCH_SIZE):
+            batch = residual[start:start + _ISSUE_BATCH_SIZE]
+            if len(batch) == 1:
+                files[batch[0]] = self._guess_files(*issues[batch[0]])
+                continue
+            
+            issues_text = "\n\n".join(
+                f"ISSUE {n}: {issues[i][0]}\n{_truncate_tokens(issues[i][1], 120)}"
+                for n, i in enumerate(batch, 1)
+            )
+            prompt = f"""Based on these {len(batch)} issues, what files might need to be modified for each?
+
+{issues_text}
+
+Return a JSON array with exactly {len(batch)} arrays of likely file paths, in issue order:
+[["path/to/file1.js", "path/to/file2.py"], ...]
+Only suggest 2-4 files per issue. Return ONLY valid JSON array."""
+
+            parsed = None
+            try:
+                response = self._generate(prompt, max_tokens=80 * len(batch) + 40, expect=list)
+                parsed = _load_json(response, list)
+            except Exception:
+                pass
+            
+            if isinstance(parsed, list) and len(parsed) == len(batch) and all(isinstance(p, list) for p in parsed):
+                for i, paths in zip(batch, parsed):
+                    files[i] = [{"path": p, "confidence": 0.5, "reason": "AI suggested"} for p in paths[:4]]
+            else:
+                for i in batch:
+                    files[i] = self._guess_files(*issues[i])
+        
+        return [item_files[:5] for item_files in files]
+
+    @staticmethod
+    def _files_from_results(results: List[Dict]) -> List[Dict]:
+        """File paths mentioned in search results, up to two per document."""
         files = []
         seen = set()
         
         for doc in results:
-            # Try to extract file paths from content
-            content = doc.get('content', '')
-            
-            # Look for file path patterns
-            file_patterns = re.findall(r'(?:src|lib|app|components?|pages?)/[\w/.-]+\.(?:js|jsx|ts|tsx|py|go|rs|java|rb)', content)
-            
-            for fp in file_patterns[:2]:
+            # Look for file path patterns in the content
+            for fp in _FILE_PATH_RE.findall(doc.get('content', ''))[:2]:
                 if fp not in seen:
                     seen.add(fp)
                     files.append({
@@ -409,67 +1251,65 @@ Return a JSON array of skill names only: ["skill1", "skill2"]"""
                         "reason": f"Related to: {doc['type']}"
                     })
         
-        # If no specific files found, use LLM to guess
-        if not files and results:
-            prompt = f"""Based on this issue, what files might need to be modified?
+        return files
+
+    def _guess_files(self, issue_title: str, issue_body: str) -> List[Dict]:
+        """Ask the LLM which files an issue likely touches."""
+        prompt = f"""Based on this issue, what files might need to be modified?
 
 ISSUE: {issue_title}
-{issue_body[:400]}
+{_truncate_tokens(issue_body, 120)}
 
 Return a JSON array of likely file paths: ["path/to/file1.js", "path/to/file2.py"]
 Only suggest 2-4 files. Return ONLY valid JSON array."""
 
-            try:
-                response = self._generate(prompt, max_tokens=200)
-                json_match = re.search(r'\[[\s\S]*\]', response)
-                if json_match:
-                    paths = json.loads(json_match.group())[:4]
-                    files = [{"path": p, "confidence": 0.5, "reason": "AI suggested"} for p in paths]
-            except Exception:
-                pass
+        try:
+            response = self._generate(prompt, max_tokens=200, expect=list)
+            paths = _load_json(response, list)
+            if paths:
+                return [{"path": p, "confidence": 0.5, "reason": "AI suggested"} for p in paths[:4]]
+        except Exception:
+            pass
         
-        return files[:5]
+        return []
 
     def extract_setup_instructions(self, repo_name: str) -> Dict:
         """
         Extract setup instructions from README.
         Returns step-by-step setup guide.
         """
-        readme_results = self.rag.search(
-            query="install setup run development environment requirements getting started",
-            repo_name=repo_name,
-            doc_type="readme",
-            top_k=1
-        )
+        cache_key = self._repo_cache_key("setup", repo_name)
+        cached = self._get_repo_cached(cache_key)
+        if cached is not None:
+            return cached
         
-        if not readme_results:
+        context = self._repo_context(repo_name)
+        if not (context["readme_full"] or context["readme_setup"]):
             return {
                 "steps": [],
                 "requirements": [],
                 "commands": []
             }
         
-        readme_content = readme_results[0]['content'][:3000]
-        
-        prompt = f"""Extract the setup instructions from this README.
-
-README:
-{readme_content}
+        prompt = """Extract the setup instructions from this repository's README.
 
 Return a JSON object with:
-{{
+{
     "requirements": ["list", "of", "prerequisites", "like", "Node 18+", "Python 3.8+"],
     "steps": ["Step 1: Clone the repo", "Step 2: Install dependencies", "Step 3: Run the app"],
     "commands": ["npm install", "npm run dev"]
-}}
+}
 
 Be specific. Return ONLY valid JSON."""
 
         try:
-            response = self._generate(prompt, max_tokens=800)
-            json_match = re.search(r'\{[\s\S]*\}', response)
-            if json_match:
-                return json.loads(json_match.group())
+            response = self._generate(
+                prompt, max_tokens=800, system=self._repo_system_prompt(context), json_mode=True
+            )
+            result = _load_json(response, dict)
+            if result is not None:
+                self._set_repo_cached(cache_key, result)
+                return result
         except Exception as e:
             logger.warning(f"[Analyzer] Setup extraction failed: {e}")
         
@@ -491,39 +1331,96 @@ Be specific. Return ONLY valid JSON."""
 ISSUE TITLE: {issue_title}
 
 ISSUE BODY:
-{issue_body[:800]}
+{_truncate_tokens(issue_body, 250)}
 
 LABELS: {labels_text}
 LANGUAGE: {language}
 
 Return a JSON object with:
-{{
-    "skills": ["list", "of", "3-5", "specific", "skills"],
-    "difficulty": "beginner" | "intermediate" | "advanced",
-    "time_estimate": "30 mins" | "1-2 hours" | "half day" | "1 day" | "2+ days",
-    "skill_level": 1-10,
-    "summary": "One sentence describing what this issue needs"
-}}
+{_ISSUE_SKILLS_SCHEMA}
 
 Be specific about skills (e.g., "React Hooks" not just "React", "REST API" not just "backend").
 Return ONLY valid JSON."""
 
         try:
-            response = self._generate(prompt, max_tokens=400)
-            json_match = re.search(r'\{[\s\S]*\}', response)
-            if json_match:
-                result = json.loads(json_match.group())
-                # Ensure all fields exist
-                result.setdefault("skills", [language] if language else ["General"])
-                result.setdefault("difficulty", "intermediate")
-                result.setdefault("time_estimate", "1-2 hours")
-                result.setdefault("skill_level", 5)
-                result.setdefault("summary", issue_title[:100])
-                return result
+            response = self._generate(prompt, max_tokens=400, json_mode=True)
+            result = _load_json(response, dict)
+            if result is not None:
+                return self._complete_issue_skills(result, issue_title, language)
         except Exception as e:
             logger.warning(f"[Analyzer] Skill analysis failed: {e}")
         
-        # Fallback based on labels
+        return self._issue_skills_fallback(issue_title, labels, language)
+
+    def analyze_issues_skills_batch(self, issues: List[Dict]) -> List[Dict]:
+        """
+        Batched analyze_issue_skills() for issue lists.
+        Each issue is a dict with title, body, labels and language keys.
+        Up to _ISSUE_BATCH_SIZE issues share one LLM call; a batch whose
+        response doesn't have one object per issue is retried per issue.
+        """
+        results = []
+        for start in range(0, len(issues), _ISSUE_BATCH_SIZE):
+            batch = issues[start:start + _ISSUE_BATCH_SIZE]
+            if len(batch) == 1:
+                results.append(self._analyze_issue_skills_item(batch[0]))
+                continue
+            
+            issues_text = "\n\n".join(
+                f"""ISSUE {i}: {issue.get("title", "")}
+LABELS: {", ".join(issue.get("labels") or []) or "none"}
+LANGUAGE: {issue.get("language", "")}
+{_truncate_tokens(issue.get("body") or "", 250)}"""
+                for i, issue in enumerate(batch, 1)
+            )
+            prompt = f"""Analyze these {len(batch)} GitHub issues and identify specific technical skills required for each.
+
+{issues_text}
+
+Return a JSON array with exactly {len(batch)} objects, in issue order, each with:
+{_ISSUE_SKILLS_SCHEMA}
+
+Be specific about skills (e.g., "React Hooks" not just "React", "REST API" not just "backend").
+Return ONLY valid JSON."""
+
+            parsed = None
+            try:
+                response = self._generate(prompt, max_tokens=200 * len(batch) + 100, expect=list)
+                parsed = _load_json(response, list)
+            except Exception as e:
+                logger.warning(f"[Analyzer] Batch skill analysis failed: {e}")
+            
+            if isinstance(parsed, list) and len(parsed) == len(batch) and all(isinstance(p, dict) for p in parsed):
+                results.extend(
+                    self._complete_issue_skills(result, issue.get("title", ""), issue.get("language", ""))
+                    for result, issue in zip(parsed, batch)
+                )
+            else:
+                results.extend(self._analyze_issue_skills_item(issue) for issue in batch)
+        
+        return results
+
+    def _analyze_issue_skills_item(self, issue: Dict) -> Dict:
+        return self.analyze_issue_skills(
+            issue.get("title", ""),
+            issue.get("body") or "",
+            issue.get("labels") or [],
+            issue.get("language", "")
+        )
+
+    @staticmethod
+    def _complete_issue_skills(result: Dict, issue_title: str, language: str) -> Dict:
+        """Ensure all fields exist in a parsed skill analysis."""
+        result.setdefault("skills", [language] if language else ["General"])
+        result.setdefault("difficulty", "intermediate")
+        result.setdefault("time_estimate", "1-2 hours")
+        result.setdefault("skill_level", 5)
+        result.setdefault("summary", issue_title[:100])
+        return result
+
+    @staticmethod
+    def _issue_skills_fallback(issue_title: str, labels: List[str], language: str) -> Dict:
+        """Skill analysis based on labels, used when the LLM fails."""
         return {
             "skills": [language] if language else ["General Programming"],
             "difficulty": "beginner" if any("beginner" in l.lower() or "easy" in l.lower() for l in labels) else "intermediate",
@@ -537,52 +1434,59 @@ Return ONLY valid JSON."""
         Simulate a senior maintainer code review.
         Provides structured feedback with blocking issues vs suggestions.
         """
-        prompt = f"""You are a Senior Maintainer reviewing a pull request. Be helpful but thorough.
+        prompt = self._code_review_prompt(code, context, language)
+        
+        try:
+            response = self._generate(prompt, max_tokens=1200, system=_CODE_REVIEW_SYSTEM_PROMPT, json_mode=True)
+            return self._parse_code_review(response)
+        except Exception as e:
+            logger.error(f"[Analyzer] Code review failed: {e}")
+        
+        return self._code_review_fallback()
+
+    def mock_code_review_stream(self, code: str, context: str = "", language: str = "python") -> Iterator[Dict]:
+        """
+        Streaming variant of mock_code_review().
+        Yields {"delta": "..."} chunks of the raw review, then {"result": {...}}.
+        """
+        prompt = self._code_review_prompt(code, context, language)
+        
+        chunks = []
+        try:
+            for chunk in self._generate_stream(
+                prompt, max_tokens=1200, system=_CODE_REVIEW_SYSTEM_PROMPT, json_mode=True
+            ):
+                chunks.append(chunk)
+                yield {"delta": chunk}
+            yield {"result": self._parse_code_review("".join(chunks))}
+        except Exception as e:
+            logger.error(f"[Analyzer] Code review failed: {e}")
+            yield {"result": self._code_review_fallback()}
 
-CONTEXT: {context if context else "A contributor is submitting this code for review."}
+    def _code_review_prompt(self, code: str, context: str, language: str) -> str:
+        return f"""CONTEXT: {context if context else "A contributor is submitting this code for review."}
 
 LANGUAGE: {language}
 
 CODE TO REVIEW:
 ```{language}
-{code[:3000]}
-```
-
-Provide a code review with:
-1. CRITICAL issues (must fix before merge) - security, bugs, logic errors
-2. SUGGESTIONS (optional improvements) - style, readability, best practices
-3. POSITIVE feedback (what's good about this code)
+{_truncate_tokens(code, 1000)}
+```"""
 
-Return a JSON object:
-{{
-    "verdict": "approve" | "request_changes" | "comment",
-    "critical": [
-        {{"line": "approximate line or code snippet", "issue": "description", "fix": "suggested fix"}}
-    ],
-    "suggestions": [
-        {{"line": "code snippet", "suggestion": "improvement idea"}}
-    ],
-    "praise": ["list", "of", "positive", "aspects"],
-    "summary": "Overall review summary in 1-2 sentences"
-}}
-
-Be constructive and educational. Explain WHY something is an issue.
-Return ONLY valid JSON."""
-
-        try:
-            response = self._generate(prompt, max_tokens=1200)
-            json_match = re.search(r'\{[\s\S]*\}', response)
-            if json_match:
-                result = json.loads(json_match.group())
-                result.setdefault("verdict", "comment")
-                result.setdefault("critical", [])
-                result.setdefault("suggestions", [])
-                result.setdefault("praise", [])
-                result.setdefault("summary", "Review complete")
-                return result
-        except Exception as e:
-            logger.error(f"[Analyzer] Code review failed: {e}")
+    def _parse_code_review(self, response: str) -> Dict:
+        """Parse the review JSON out of an LLM response (fallback if none)."""
+        result = _load_json(response, dict)
+        if result is None:
+            return self._code_review_fallback()
         
+        result.setdefault("verdict", "comment")
+        result.setdefault("critical", [])
+        result.setdefault("suggestions", [])
+        result.setdefault("praise", [])
+        result.setdefault("summary", "Review complete")
+        return result
+
+    def _code_review_fallback(self) -> Dict:
         return {
             "verdict": "comment",
             "critical": [],
@@ -596,9 +1500,17 @@ Return ONLY valid JSON."""
         Calculate maintainer warmth/friendliness score for a repository.
         Analyzes response patterns and sentiment.
         """
+        # Only results derived from the index are cacheable
+        cache_key = None
+        
         # Get issues from RAG if not provided
         if not issues_data:
-            results = self.rag.search(
+            cache_key = self._repo_cache_key("warmth", repo_name)
+            cached = self._get_repo_cached(cache_key)
+            if cached is not None:
+                return cached
+            
+            results = self._search(
                 query="issue discussion maintainer response",
                 repo_name=repo_name,
                 doc_type="issue",
@@ -610,14 +1522,14 @@ Return ONLY valid JSON."""
                     "label": "Unknown",
                     "factors": {"data": "Insufficient data to calculate warmth score"}
                 }
-            issues_text = "\n".join([doc['content'][:300] for doc in results])
+            issues_text = "\n".join([_truncate_tokens(doc['content'], 90) for doc in results])
         else:
-            issues_text = "\n".join([f"{d.get('title', '')} - {d.get('body', '')[:200]}" for d in issues_data[:10]])
+            issues_text = "\n".join([f"{d.get('title', '')} - {_truncate_tokens(d.get('body') or '', 60)}" for d in issues_data[:10]])
 
         prompt = f"""Analyze these GitHub issue discussions to determine how welcoming this repository is to new contributors.
 
 ISSUE DISCUSSIONS:
-{issues_text[:2000]}
+{_truncate_tokens(issues_text, 600)}
 
 Rate the maintainer warmth/friendliness:
 
@@ -637,12 +1549,13 @@ Consider: response time patterns, tone of comments, helpfulness, patience with b
 Return ONLY valid JSON."""
 
         try:
-            response = self._generate(prompt, max_tokens=500)
-            json_match = re.search(r'\{[\s\S]*\}', response)
-            if json_match:
-                result = json.loads(json_match.group())
+            response = self._generate(prompt, max_tokens=500, json_mode=True)
+            result = _load_json(response, dict)
+            if result is not None:
                 result.setdefault("score", 50)
                 result.setdefault("label", "Unknown")
+                if cache_key:
+                    self._set_repo_cached(cache_key, result)
                 return result
         except Exception as e:
             logger.warning(f"[Analyzer] Warmth score failed: {e}")
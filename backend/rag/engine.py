@@ -2,14 +2,33 @@
 RAG Engine - Advanced embedding and vector storage with HyDE and hybrid search.
 """
 import os
+import copy
+import json
+import time
+import asyncio
+import hashlib
 import logging
+import threading
 import requests
-from typing import List, Dict, Optional
-from sentence_transformers import SentenceTransformer
+import numpy as np
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import List, Dict, Optional, Set
+from cachetools import LRUCache, TTLCache
+from diskcache import Cache
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue, Range, PointIdsList,
+    SearchRequest, PayloadSchemaType, BinaryQuantization, BinaryQuantizationConfig, SearchParams, QuantizationSearchParams
+)
 import uuid
 
+try:
+    from fastembed import TextEmbedding
+except ImportError:  # Fall back to PyTorch inference via sentence-transformers
+    TextEmbedding = None
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,10 +37,57 @@ class RAGEngine:
     
     COLLECTION_NAME = "repo_docs"
     EMBEDDING_DIM = 384  # all-MiniLM-L6-v2 dimension
+    EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBED_BATCH_SIZE = 64
+    EMBED_PARALLEL_MIN = 512  # batches at least this large use data-parallel workers
+    UPSERT_BATCH_SIZE = 128
+    
+    # Semantic cache of answered questions
+    # 1-bit vectors in RAM for candidate search, rescored with the originals
+    QUANTIZATION = BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    SEARCH_PARAMS = SearchParams(
+        quantization=QuantizationSearchParams(ignore=False, rescore=True, oversampling=2.0)
+    )
+    
+    QA_CACHE_COLLECTION = "qa_cache"
+    QA_CACHE_THRESHOLD = 0.92
+    QA_CACHE_TTL = 86400  # 24 hours
+    
+    PAYLOAD_INDEXES = {
+        COLLECTION_NAME: {"repo_name": PayloadSchemaType.KEYWORD, "doc_type": PayloadSchemaType.KEYWORD},
+        QA_CACHE_COLLECTION: {"repo_name": PayloadSchemaType.KEYWORD, "ts": PayloadSchemaType.FLOAT}
+    }
+    
+    # In-process caches for repeated queries
+    EMBED_CACHE_SIZE = 1024
+    HYDE_CACHE_SIZE = 256
+    HYDE_CACHE_TTL = 3600  # 1 hour
+    HYDE_MODEL = "llama-3.1-8b-instant"  # a 2-3 sentence draft doesn't need a 70B model
+    HYDE_MAX_TOKENS = 80
+    HYDE_DEADLINE = 2.0  # seconds to wait for HyDE before using the plain query
+    QUERY_CACHE_SIZE = 512
+    QUERY_CACHE_THRESHOLD = 0.86
+    
+    # In-process mirror of each repo's vectors, searched exactly with numpy
+    SHARD_MAX_POINTS = 50000  # larger repos are only searched in Qdrant
+    SHARD_CACHE_POINTS = 200000  # total points mirrored across repos (~300 MB of vectors)
+    SHARD_TTL = 300  # seconds before re-reading points other workers may have written
     
     def __init__(self):
         logger.info("[RAG] Initializing embedding model...")
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+        if TextEmbedding is not None:
+            # ONNX Runtime inference, several times faster than PyTorch on CPU
+            self.embedder = TextEmbedding(model_name=self.EMBED_MODEL, threads=os.cpu_count())
+        else:
+            from sentence_transformers import SentenceTransformer
+            self.embedder = SentenceTransformer(self.EMBED_MODEL)
+            if self.embedder.device.type == "cpu":
+                # Dynamic int8 Linear layers: about half the memory traffic
+                # of FP32 for <1% cosine drift on MiniLM
+                import torch
+                torch.quantization.quantize_dynamic(
+                    self.embedder, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+                )
         
         logger.info("[RAG] Connecting to Qdrant...")
         
@@ -29,7 +95,8 @@ class RAGEngine:
         qdrant_url = os.getenv("QDRANT_URL")
         qdrant_api_key = os.getenv("QDRANT_API_KEY")
         
-        if qdrant_url and qdrant_api_key:
+        self._remote = bool(qdrant_url and qdrant_api_key)
+        if self._remote:
             # Use Qdrant Cloud
             logger.info(f"[RAG] Using Qdrant Cloud: {qdrant_url[:50]}...")
             self.client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key)
@@ -40,34 +107,205 @@ class RAGEngine:
         
         self._init_collection()
         
+        # Per-repo counter bumped whenever a repo's documents change, so
+        # callers can key derived results on the current index contents
+        self._index_versions: Dict[str, int] = {}
+        
+        # Indexed repo names, loaded once and kept current on index/delete
+        # so listing repos never needs a Qdrant scan
+        self._repos_lock = threading.Lock()
+        self._indexed_repos: Set[str] = self._load_indexed_repos()
+        
         # LLM config for HyDE
         self.groq_key = os.getenv("GROQ_API_KEY")
         self.hf_token = os.getenv("HUGGINGFACEHUB_API_TOKEN")
         
+        # HyDE runs here so search() can stop waiting for it at HYDE_DEADLINE
+        self._hyde_pool = ThreadPoolExecutor(max_workers=4)
+        
+        # Keep-alive session for HyDE calls, so only the first one pays for TLS
+        self._http = requests.Session()
+        self._http.mount("https://", HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(
+                total=2,
+                backoff_factor=0.2,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=frozenset({"POST"})
+            )
+        ))
+        self._http.headers.update({
+            "Authorization": f"Bearer {self.groq_key}",
+            "Content-Type": "application/json"
+        })
+        
+        # Embeddings and HyDE documents keyed by SHA-256 of their input text
+        self._embed_cache = LRUCache(maxsize=self.EMBED_CACHE_SIZE)
+        
+        # Persistent document embeddings, so re-indexing (or forks sharing
+        # README sections) only embeds content never seen before. Keys
+        # include the model/backend since their vectors differ slightly.
+        self._emb_store = Cache(os.getenv("EMBED_CACHE_DIR", ".embedding_cache"))
+        self._emb_store_prefix = f"{self.EMBED_MODEL}|{'onnx' if TextEmbedding else 'torch'}|"
+        self._hyde_cache = TTLCache(maxsize=self.HYDE_CACHE_SIZE, ttl=self.HYDE_CACHE_TTL)
+        self._cache_lock = threading.Lock()
+        
+        # Semantic query cache: ring buffer of normalized query vectors, the
+        # (repo, doc_type, top_k, hyde) filter each was run with (as a small
+        # int id, -1 for empty slots), and its hits
+        self._qcache_vecs = np.zeros((self.QUERY_CACHE_SIZE, self.EMBEDDING_DIM), dtype=np.float32)
+        self._qcache_keys = np.full(self.QUERY_CACHE_SIZE, -1, dtype=np.int32)
+        self._qcache_key_ids: Dict[tuple, int] = {}
+        self._qcache_results: List[Optional[List[Dict]]] = [None] * self.QUERY_CACHE_SIZE
+        self._qcache_next = 0
+        
+        # Per-repo shards ({"ids", "vectors", "payloads", "doc_types",
+        # "loaded_at"}); None marks a repo too large to mirror. The LRU is
+        # bounded by total points; loads are single-flighted per repo and
+        # expired shards are refreshed in the background
+        self._shards = LRUCache(
+            maxsize=self.SHARD_CACHE_POINTS,
+            getsizeof=lambda shard: len(shard["ids"]) if shard else 1
+        )
+        self._shards_lock = threading.Lock()
+        self._shard_loads: Dict[str, Future] = {}
+        self._shard_pool = ThreadPoolExecutor(max_workers=2)
+        
         logger.info("[RAG] Engine initialized successfully!")
     
     def _init_collection(self):
-        """Create the collection if it doesn't exist."""
+        """Create the collections if they don't exist."""
         collections = self.client.get_collections()
         existing = [c.name for c in collections.collections]
         
+        if self.QA_CACHE_COLLECTION not in existing:
+            self.client.create_collection(
+                collection_name=self.QA_CACHE_COLLECTION,
+                vectors_config=VectorParams(
+                    size=self.EMBEDDING_DIM,
+                    distance=Distance.COSINE
+                )
+            )
+            logger.info(f"[RAG] Created collection: {self.QA_CACHE_COLLECTION}")
+        
         if self.COLLECTION_NAME not in existing:
             self.client.create_collection(
                 collection_name=self.COLLECTION_NAME,
                 vectors_config=VectorParams(
                     size=self.EMBEDDING_DIM,
                     distance=Distance.COSINE
-                )
+                ),
+                quantization_config=self.QUANTIZATION
             )
             logger.info(f"[RAG] Created collection: {self.COLLECTION_NAME}")
+        
+        info = self.client.get_collection(self.COLLECTION_NAME)
+        if info.config.quantization_config is None:
+            # Collections created before quantization was enabled
+            self.client.update_collection(
+                collection_name=self.COLLECTION_NAME,
+                quantization_config=self.QUANTIZATION
+            )
+            logger.info(f"[RAG] Enabled binary quantization on {self.COLLECTION_NAME}")
+        
+        # Payload indexes for the fields every search/delete filters on, and
+        # for listing distinct repo names (they are a no-op in local mode)
+        if self._remote:
+            for name, fields in self.PAYLOAD_INDEXES.items():
+                schema = self.client.get_collection(name).payload_schema
+                for field_name, field_schema in fields.items():
+                    if field_name not in schema:
+                        self.client.create_payload_index(
+                            collection_name=name,
+                            field_name=field_name,
+                            field_schema=field_schema
+                        )
+                        logger.info(f"[RAG] Created payload index {name}.{field_name}")
     
-    def embed_text(self, text: str) -> List[float]:
-        """Generate embedding for a single text."""
-        return self.embedder.encode(text, convert_to_numpy=True).tolist()
+    @staticmethod
+    def _text_key(text: str) -> str:
+        return hashlib.sha256(text.encode()).hexdigest()
     
-    def embed_batch(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts."""
-        return self.embedder.encode(texts, convert_to_numpy=True).tolist()
+    def embed_text(self, text: str) -> np.ndarray:
+        """Generate embedding for a single text (cached, read-only float32 array)."""
+        key = self._text_key(text)
+        with self._cache_lock:
+            cached = self._embed_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        embedding = self._encode([text])[0]
+        with self._cache_lock:
+            self._embed_cache[key] = embedding
+        return embedding
+    
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for multiple texts (one float32 row each). Cached
+        texts are served from the embedding cache; the rest go through one
+        batched forward pass.
+        """
+        if not texts:
+            return np.empty((0, self.EMBEDDING_DIM), dtype=np.float32)
+        
+        keys = [self._text_key(text) for text in texts]
+        with self._cache_lock:
+            embeddings = [self._embed_cache.get(key) for key in keys]
+        
+        misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if misses:
+            encoded = self._encode([texts[i] for i in misses])
+            with self._cache_lock:
+                for i, embedding in zip(misses, encoded):
+                    embeddings[i] = self._embed_cache[keys[i]] = embedding
+        
+        return np.stack(embeddings)
+    
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeddings for documents being indexed, read through the persistent
+        embedding store (the in-memory cache is left to queries).
+        """
+        keys = [self._text_key(self._emb_store_prefix + text) for text in texts]
+        embeddings = [self._emb_store.get(key) for key in keys]
+        
+        misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if misses:
+            for i, embedding in zip(misses, self._encode([texts[i] for i in misses])):
+                embeddings[i] = embedding
+                self._emb_store.set(keys[i], embedding)
+        
+        return np.stack(embeddings) if embeddings else np.empty((0, self.EMBEDDING_DIM), dtype=np.float32)
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Unit-normalized float32 embeddings, one row per text. The array is
+        read-only because its rows are shared through the embedding cache.
+        """
+        if TextEmbedding is None:
+            # sentence-transformers already length-sorts each encode call
+            embeddings = self.embedder.encode(
+                texts,
+                batch_size=self.EMBED_BATCH_SIZE,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            ).astype(np.float32, copy=False)
+            embeddings.setflags(write=False)
+            return embeddings
+        
+        # Encode in length order so each mini-batch pads to similar lengths,
+        # then restore the caller's order
+        order = np.argsort([len(text) for text in texts], kind="stable")
+        embeddings = np.stack(list(self.embedder.embed(
+            [texts[i] for i in order],
+            batch_size=self.EMBED_BATCH_SIZE,
+            parallel=0 if len(texts) >= self.EMBED_PARALLEL_MIN else None
+        ))).astype(np.float32, copy=False)[np.argsort(order)]
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        embeddings.setflags(write=False)
+        return embeddings
     
     def _generate_hyde_document(self, query: str) -> str:
         """
@@ -77,6 +315,12 @@ class RAGEngine:
         if not self.groq_key:
             return query  # Fallback to original query
         
+        key = self._text_key(query)
+        with self._cache_lock:
+            cached = self._hyde_cache.get(key)
+        if cached is not None:
+            return cached
+        
         prompt = f"""Given this question about a GitHub repository, write a short paragraph (2-3 sentences) that would be a good answer. Be specific and technical.
 
 Question: {query}
@@ -84,17 +328,14 @@ Question: {query}
 Answer:"""
         
         try:
-            response = requests.post(
+            response = self._http.post(
                 "https://api.groq.com/openai/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.groq_key}",
-                    "Content-Type": "application/json"
-                },
                 json={
-                    "model": "llama-3.3-70b-versatile",
+                    "model": self.HYDE_MODEL,
                     "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": 150,
-                    "temperature": 0.3
+                    "max_tokens": self.HYDE_MAX_TOKENS,
+                    "temperature": 0.3,
+                    "stop": ["\n\n"]  # One paragraph is all HyDE needs
                 },
                 timeout=10
             )
@@ -102,45 +343,152 @@ Answer:"""
             if response.ok:
                 answer = response.json()["choices"][0]["message"]["content"].strip()
                 logger.info(f"[RAG] HyDE generated: {answer[:80]}...")
+                with self._cache_lock:
+                    self._hyde_cache[key] = answer
                 return answer
         except Exception as e:
             logger.warning(f"[RAG] HyDE generation failed: {e}")
         
         return query
     
+    @staticmethod
+    def _document_id(repo_name: str, doc: Dict) -> str:
+        """Stable point ID derived from a document's repo, type, content and metadata."""
+        digest = hashlib.sha256(json.dumps(
+            [repo_name, doc.get('type', 'unknown'), doc['content'], doc.get('metadata', {})],
+            sort_keys=True,
+            default=str
+        ).encode()).hexdigest()
+        return str(uuid.UUID(digest[:32]))
+    
+    def _get_repo_point_ids(self, repo_name: str) -> Set[str]:
+        """IDs of all points currently stored for a repository."""
+        repo_filter = Filter(
+            must=[FieldCondition(key="repo_name", match=MatchValue(value=repo_name))]
+        )
+        point_ids = set()
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.COLLECTION_NAME,
+                scroll_filter=repo_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False
+            )
+            point_ids.update(str(point.id) for point in points)
+            if offset is None:
+                return point_ids
+    
     def index_documents(self, repo_name: str, documents: List[Dict]) -> int:
-        """Index documents into the vector store."""
+        """Synchronous wrapper around index_documents_async()."""
+        return asyncio.run(self.index_documents_async(repo_name, documents))
+    
+    async def index_documents_async(self, repo_name: str, documents: List[Dict]) -> int:
+        """
+        Index documents into the vector store incrementally.
+        Point IDs are content hashes, so only new or changed documents are
+        embedded and upserted, and documents no longer present are deleted.
+        Embedding and upserting run as a pipeline: batch N+1 is embedded
+        while batch N is being written to Qdrant.
+        """
         if not documents:
             return 0
         
-        # Generate embeddings for all documents
-        texts = [doc['content'] for doc in documents]
-        embeddings = self.embed_batch(texts)
-        
-        # Create points for Qdrant
-        points = []
-        for doc, embedding in zip(documents, embeddings):
-            point_id = str(uuid.uuid4())
-            payload = {
-                "repo_name": repo_name,
-                "content": doc['content'],
-                "doc_type": doc.get('type', 'unknown'),
-                **doc.get('metadata', {})
-            }
-            points.append(PointStruct(
-                id=point_id,
-                vector=embedding,
-                payload=payload
-            ))
+        # Deduplicate by content-derived ID (keeps the first occurrence)
+        docs_by_id = {}
+        for doc in documents:
+            docs_by_id.setdefault(self._document_id(repo_name, doc), doc)
         
-        # Upsert to Qdrant
-        self.client.upsert(
-            collection_name=self.COLLECTION_NAME,
-            points=points
-        )
+        # The fresh shard doubles as the list of stored point IDs
+        shard = await asyncio.to_thread(self._load_shard, repo_name)
+        if shard is not None:
+            existing_ids = set(shard["ids"])
+        else:
+            existing_ids = await asyncio.to_thread(self._get_repo_point_ids, repo_name)
+        new_docs = [
+            (point_id, doc) for point_id, doc in docs_by_id.items()
+            if point_id not in existing_ids
+        ]
+        stale_ids = existing_ids - docs_by_id.keys()
+        new_vectors, new_payloads = [], []
+        
+        if new_docs:
+            # Embedded batches (or the embedding error), then None when done
+            batches = asyncio.Queue(maxsize=4)
+            
+            async def embed_batches():
+                try:
+                    for start in range(0, len(new_docs), self.UPSERT_BATCH_SIZE):
+                        batch = new_docs[start:start + self.UPSERT_BATCH_SIZE]
+                        embeddings = await asyncio.to_thread(
+                            self.embed_documents, [doc['content'] for _, doc in batch]
+                        )
+                        payloads = [
+                            {
+                                "repo_name": repo_name,
+                                "content": doc['content'],
+                                "doc_type": doc.get('type', 'unknown'),
+                                **doc.get('metadata', {})
+                            }
+                            for _, doc in batch
+                        ]
+                        new_vectors.append(embeddings)
+                        new_payloads.extend(payloads)
+                        await batches.put([
+                            PointStruct(id=point_id, vector=embedding, payload=payload)
+                            for (point_id, _), embedding, payload in zip(batch, embeddings, payloads)
+                        ])
+                except Exception as e:
+                    await batches.put(e)
+                    return
+                await batches.put(None)
+            
+            producer = asyncio.create_task(embed_batches())
+            try:
+                while (points := await batches.get()) is not None:
+                    if isinstance(points, Exception):
+                        raise points
+                    await asyncio.to_thread(
+                        self.client.upsert,
+                        collection_name=self.COLLECTION_NAME,
+                        points=points,
+                        wait=False
+                    )
+            finally:
+                producer.cancel()  # No-op once it has finished
+        
+        if stale_ids:
+            await asyncio.to_thread(
+                self.client.delete,
+                collection_name=self.COLLECTION_NAME,
+                points_selector=PointIdsList(points=list(stale_ids))
+            )
+        
+        if shard is not None:
+            keep = [i for i, point_id in enumerate(shard["ids"]) if point_id not in stale_ids]
+            ids = [shard["ids"][i] for i in keep] + [point_id for point_id, _ in new_docs]
+            shard = self._make_shard(
+                ids,
+                np.concatenate([shard["vectors"][keep], *new_vectors]),
+                [shard["payloads"][i] for i in keep] + new_payloads
+            ) if len(ids) <= self.SHARD_MAX_POINTS else None
+        with self._shards_lock:
+            self._store_shard(repo_name, shard)
         
-        logger.info(f"[RAG] Indexed {len(points)} documents for {repo_name}")
-        return len(points)
+        if new_docs or stale_ids:
+            await asyncio.to_thread(self._clear_cached_answers, repo_name)
+            self._bump_index_version(repo_name)
+        
+        with self._repos_lock:
+            self._indexed_repos.add(repo_name)
+        
+        logger.info(
+            f"[RAG] Indexed {len(docs_by_id)} documents for {repo_name} "
+            f"({len(new_docs)} embedded, {len(stale_ids)} removed)"
+        )
+        return len(docs_by_id)
     
     def search(
         self, 
@@ -160,14 +508,115 @@ Answer:"""
             doc_type: Filter by document type
             use_hyde: Use hypothetical document embeddings for better recall
         """
-        # Apply HyDE if enabled
-        search_text = query
-        if use_hyde and len(query) > 20:
-            search_text = self._generate_hyde_document(query)
+        use_hyde = use_hyde and len(query) > 20
+        query_embedding = self.embed_text(query)
+        
+        # Near-duplicate of a recent query with the same filters
+        cache_key = (repo_name, doc_type, top_k, use_hyde)
+        cached = self._cached_search(query_embedding, cache_key)
+        if cached is not None:
+            return cached
+        
+        # Apply HyDE if enabled; a slow or failed generation falls back to
+        # the query embedding (a late result still lands in the HyDE cache)
+        search_embedding = query_embedding
+        if use_hyde:
+            hyde = self._hyde_pool.submit(self._generate_hyde_document, query)
+            try:
+                hyde_text = hyde.result(timeout=self.HYDE_DEADLINE)
+            except FutureTimeout:
+                logger.info(f"[RAG] HyDE exceeded {self.HYDE_DEADLINE}s, searching with the query")
+                hyde_text = query
+            if hyde_text != query:
+                search_embedding = self.embed_text(hyde_text)
+        
+        shard = self._get_shard(repo_name) if repo_name else None
+        if shard is not None:
+            hits = self._shard_search(shard, search_embedding, top_k, doc_type)
+        else:
+            hits = self._format_hits(self.client.search(
+                collection_name=self.COLLECTION_NAME,
+                query_vector=search_embedding,
+                query_filter=self._search_filter(repo_name, doc_type),
+                search_params=self.SEARCH_PARAMS,
+                limit=top_k
+            ))
+        self._cache_search(query_embedding, cache_key, hits)
+        return hits
+    
+    def _cached_search(self, query_embedding: np.ndarray, cache_key: tuple) -> Optional[List[Dict]]:
+        """Hits of the most similar cached query with matching filters, if similar enough."""
+        with self._cache_lock:
+            key_id = self._qcache_key_ids.get(cache_key)
+            if key_id is None:
+                return None
+            slots = np.flatnonzero(self._qcache_keys == key_id)
+            if not len(slots):
+                return None
+            # Stored vectors and the query are unit-normalized: one gemv over
+            # the matching rows gives their cosines
+            sims = self._qcache_vecs[slots] @ query_embedding
+            best = int(np.argmax(sims))
+            if sims[best] < self.QUERY_CACHE_THRESHOLD:
+                return None
+            return copy.deepcopy(self._qcache_results[slots[best]])
+    
+    def _cache_search(self, query_embedding: np.ndarray, cache_key: tuple, hits: List[Dict]) -> None:
+        """Store hits for a query, evicting the oldest entry when full."""
+        with self._cache_lock:
+            slot = self._qcache_next
+            self._qcache_vecs[slot] = query_embedding
+            self._qcache_keys[slot] = self._qcache_key_ids.setdefault(cache_key, len(self._qcache_key_ids))
+            self._qcache_results[slot] = copy.deepcopy(hits)
+            self._qcache_next = (slot + 1) % self.QUERY_CACHE_SIZE
+    
+    def _clear_search_cache(self) -> None:
+        with self._cache_lock:
+            self._qcache_keys.fill(-1)
+            self._qcache_key_ids.clear()
+            self._qcache_results = [None] * self.QUERY_CACHE_SIZE
+    
+    def search_batch(
+        self,
+        queries: List[str],
+        repo_name: Optional[str] = None,
+        top_k: int = 5,
+        doc_type: Optional[str] = None
+    ) -> List[List[Dict]]:
+        """
+        search() for many queries: one batched encode and one Qdrant
+        round-trip. Returns one result list per query, in order.
+        """
+        if not queries:
+            return []
         
-        query_embedding = self.embed_text(search_text)
+        shard = self._get_shard(repo_name) if repo_name else None
+        if shard is not None:
+            return [
+                self._shard_search(shard, embedding, top_k, doc_type)
+                for embedding in self.embed_batch(queries)
+            ]
         
-        # Build filter conditions
+        search_filter = self._search_filter(repo_name, doc_type)
+        batch_results = self.client.search_batch(
+            collection_name=self.COLLECTION_NAME,
+            requests=[
+                SearchRequest(
+                    vector=embedding,
+                    filter=search_filter,
+                    params=self.SEARCH_PARAMS,
+                    limit=top_k,
+                    with_payload=True
+                )
+                for embedding in self.embed_batch(queries)
+            ]
+        )
+        
+        return [self._format_hits(results) for results in batch_results]
+    
+    @staticmethod
+    def _search_filter(repo_name: Optional[str], doc_type: Optional[str]) -> Optional[Filter]:
+        """Payload filter for the optional repo/doc-type restrictions."""
         filter_conditions = []
         if repo_name:
             filter_conditions.append(
@@ -178,24 +627,130 @@ Answer:"""
                 FieldCondition(key="doc_type", match=MatchValue(value=doc_type))
             )
         
-        search_filter = Filter(must=filter_conditions) if filter_conditions else None
-        
-        results = self.client.search(
-            collection_name=self.COLLECTION_NAME,
-            query_vector=query_embedding,
-            query_filter=search_filter,
-            limit=top_k
+        return Filter(must=filter_conditions) if filter_conditions else None
+    
+    @staticmethod
+    def _format_hit(payload: Dict, score: float) -> Dict:
+        return {
+            "content": payload.get("content", ""),
+            "type": payload.get("doc_type", "unknown"),
+            "score": score,
+            "metadata": {k: v for k, v in payload.items() 
+                       if k not in ["content", "doc_type", "repo_name"]}
+        }
+    
+    @staticmethod
+    def _format_hits(results) -> List[Dict]:
+        return [RAGEngine._format_hit(hit.payload, hit.score) for hit in results]
+    
+    def _get_shard(self, repo_name: str) -> Optional[Dict]:
+        """
+        A repo's in-memory shard, or None to search it in Qdrant. A missing
+        shard is loaded (joining a load already in flight); an expired one is
+        served while a background reload replaces it.
+        """
+        with self._shards_lock:
+            if repo_name in self._shards:
+                shard = self._shards[repo_name]
+                if shard is not None and time.time() - shard["loaded_at"] >= self.SHARD_TTL:
+                    self._start_shard_load(repo_name)
+                return shard
+            load = self._start_shard_load(repo_name)
+        return load.result()
+    
+    def _start_shard_load(self, repo_name: str) -> Future:
+        """Future for the repo's shard load, submitting one unless already running (lock held)."""
+        load = self._shard_loads.get(repo_name)
+        if load is None:
+            load = self._shard_loads[repo_name] = self._shard_pool.submit(
+                self._reload_shard, repo_name, self.index_version(repo_name), time.time()
+            )
+        return load
+    
+    def _reload_shard(self, repo_name: str, version: int, started: float) -> Optional[Dict]:
+        try:
+            shard = self._load_shard(repo_name)
+            with self._shards_lock:
+                current = self._shards.get(repo_name)
+                # Don't overwrite a shard patched by a re-index, or revive a
+                # repo deleted, while this load was reading
+                if self.index_version(repo_name) == version and not (current and current["loaded_at"] > started):
+                    self._store_shard(repo_name, shard)
+            return shard if shard is None or shard["ids"] else None
+        finally:
+            with self._shards_lock:
+                self._shard_loads.pop(repo_name, None)
+    
+    def _store_shard(self, repo_name: str, shard: Optional[Dict]) -> None:
+        """
+        Cache a repo's shard (lock held). Empty shards aren't kept: the repo
+        may not be indexed yet, or was indexed by another worker, so its
+        searches go to Qdrant.
+        """
+        if shard is not None and not shard["ids"]:
+            self._shards.pop(repo_name, None)
+        else:
+            self._shards[repo_name] = shard
+    
+    def _load_shard(self, repo_name: str) -> Optional[Dict]:
+        """Read all of a repo's points with their vectors (None if over SHARD_MAX_POINTS)."""
+        repo_filter = Filter(
+            must=[FieldCondition(key="repo_name", match=MatchValue(value=repo_name))]
         )
+        ids, vectors, payloads = [], [], []
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.COLLECTION_NAME,
+                scroll_filter=repo_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            for point in points:
+                ids.append(str(point.id))
+                vectors.append(point.vector)
+                payloads.append(point.payload)
+            if len(ids) > self.SHARD_MAX_POINTS:
+                logger.info(f"[RAG] {repo_name} has over {self.SHARD_MAX_POINTS} points, searching it in Qdrant")
+                return None
+            if offset is None:
+                break
         
+        return self._make_shard(
+            ids,
+            np.asarray(vectors, dtype=np.float32).reshape(-1, self.EMBEDDING_DIM),
+            payloads
+        )
+    
+    @staticmethod
+    def _make_shard(ids: List[str], vectors: np.ndarray, payloads: List[Dict]) -> Dict:
+        return {
+            "ids": ids,
+            "vectors": vectors,
+            "payloads": payloads,
+            "doc_types": np.array([payload.get("doc_type", "unknown") for payload in payloads], dtype=object),
+            "loaded_at": time.time()
+        }
+    
+    def _shard_search(
+        self,
+        shard: Dict,
+        query_embedding: np.ndarray,
+        top_k: int,
+        doc_type: Optional[str] = None
+    ) -> List[Dict]:
+        """Exact cosine top-k over a shard (vectors are unit-normalized)."""
+        rows = (
+            np.flatnonzero(shard["doc_types"] == doc_type) if doc_type
+            else np.arange(len(shard["ids"]))
+        )
+        sims = shard["vectors"][rows] @ query_embedding
+        best = np.argsort(-sims, kind="stable")[:top_k]
         return [
-            {
-                "content": hit.payload.get("content", ""),
-                "type": hit.payload.get("doc_type", "unknown"),
-                "score": hit.score,
-                "metadata": {k: v for k, v in hit.payload.items() 
-                           if k not in ["content", "doc_type", "repo_name"]}
-            }
-            for hit in results
+            self._format_hit(copy.deepcopy(shard["payloads"][rows[i]]), float(sims[i]))
+            for i in best
         ]
     
     def search_with_context(
@@ -258,27 +813,134 @@ Answer:"""
         return results
     
     def delete_repo(self, repo_name: str) -> bool:
-        """Delete all documents for a repository."""
+        """Delete all documents (and cached answers) for a repository."""
         self.client.delete(
             collection_name=self.COLLECTION_NAME,
             points_selector=Filter(
                 must=[FieldCondition(key="repo_name", match=MatchValue(value=repo_name))]
             )
         )
+        self._clear_cached_answers(repo_name)
+        self._bump_index_version(repo_name)
+        with self._shards_lock:
+            self._shards.pop(repo_name, None)
+        with self._repos_lock:
+            self._indexed_repos.discard(repo_name)
         logger.info(f"[RAG] Deleted documents for {repo_name}")
         return True
     
+    def index_version(self, repo_name: str) -> int:
+        """Current index generation of a repository (changes on every re-index)."""
+        return self._index_versions.get(repo_name, 0)
+    
+    def _bump_index_version(self, repo_name: str) -> None:
+        self._index_versions[repo_name] = self._index_versions.get(repo_name, 0) + 1
+        self._clear_search_cache()
+    
+    def _clear_cached_answers(self, repo_name: str) -> None:
+        """Drop cached answers for a repository whose documents changed."""
+        self.client.delete(
+            collection_name=self.QA_CACHE_COLLECTION,
+            points_selector=Filter(
+                must=[FieldCondition(key="repo_name", match=MatchValue(value=repo_name))]
+            )
+        )
+    
+    def get_cached_answer(
+        self,
+        repo_name: str,
+        question: str,
+        vector: Optional[np.ndarray] = None
+    ) -> Optional[Dict]:
+        """
+        Look up a previous answer to a semantically equivalent question.
+        Pass the question's embedding as vector to skip re-encoding it.
+        Returns {"answer", "sources"} on a hit, None otherwise.
+        """
+        hits = self.client.search(
+            collection_name=self.QA_CACHE_COLLECTION,
+            query_vector=vector if vector is not None else self.embed_text(question),
+            query_filter=Filter(must=[
+                FieldCondition(key="repo_name", match=MatchValue(value=repo_name)),
+                FieldCondition(key="ts", range=Range(gte=time.time() - self.QA_CACHE_TTL))
+            ]),
+            limit=1,
+            score_threshold=self.QA_CACHE_THRESHOLD
+        )
+        
+        if not hits:
+            return None
+        
+        logger.info(f"[RAG] Answer cache hit for {repo_name} (score {hits[0].score:.3f})")
+        return {
+            "answer": hits[0].payload["answer"],
+            "sources": hits[0].payload.get("sources", [])
+        }
+    
+    def cache_answer(
+        self,
+        repo_name: str,
+        question: str,
+        result: Dict,
+        vector: Optional[np.ndarray] = None
+    ) -> None:
+        """Store an answer so similar questions can be served from cache."""
+        self.client.upsert(
+            collection_name=self.QA_CACHE_COLLECTION,
+            points=[PointStruct(
+                id=str(uuid.uuid4()),
+                vector=vector if vector is not None else self.embed_text(question),
+                payload={
+                    "repo_name": repo_name,
+                    "question": question,
+                    "answer": result["answer"],
+                    "sources": result["sources"],
+                    "ts": time.time()
+                }
+            )],
+            wait=False
+        )
+    
+    def evict_cached_answers(self, max_age: int = QA_CACHE_TTL) -> None:
+        """Delete cached answers older than max_age seconds."""
+        self.client.delete(
+            collection_name=self.QA_CACHE_COLLECTION,
+            points_selector=Filter(must=[
+                FieldCondition(key="ts", range=Range(lt=time.time() - max_age))
+            ])
+        )
+        logger.info("[RAG] Evicted expired cached answers")
+    
     def get_indexed_repos(self) -> List[str]:
         """Get list of all indexed repository names."""
-        results = self.client.scroll(
-            collection_name=self.COLLECTION_NAME,
-            limit=1000,
-            with_payload=["repo_name"]
-        )
+        with self._repos_lock:
+            return sorted(self._indexed_repos)
+    
+    def _load_indexed_repos(self) -> Set[str]:
+        """Collect the distinct repo names stored in Qdrant."""
+        # Server-side distinct values on clients/servers with the facet API
+        if hasattr(self.client, "facet"):
+            try:
+                response = self.client.facet(
+                    collection_name=self.COLLECTION_NAME,
+                    key="repo_name",
+                    limit=10000
+                )
+                return {hit.value for hit in response.hits}
+            except Exception as e:
+                logger.warning(f"[RAG] Facet query failed, scanning repo names: {e}")
         
         repos = set()
-        for point in results[0]:
-            if point.payload and "repo_name" in point.payload:
-                repos.add(point.payload["repo_name"])
-        
-        return list(repos)
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.COLLECTION_NAME,
+                limit=1000,
+                offset=offset,
+                with_payload=["repo_name"]
+            )
+            for point in points:
+                if point.payload and "repo_name" in point.payload:
+                    repos.add(point.payload["repo_name"])
+            if offset is None:
+                return repos
@@ -4,25 +4,112 @@ Advanced chunking: parses README into sections for better context retrieval.
 """
 import os
 import re
+import math
 import base64
+import asyncio
 import logging
+from collections import defaultdict
 from typing import List, Dict, Optional
-from github import Github, GithubException, Auth
+import httpx
 
 logger = logging.getLogger(__name__)
 
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+
+# Cap on in-flight requests per fetcher (GitHub secondary rate limits)
+MAX_CONCURRENT_REQUESTS = 10
+
+# Markdown header line and long fenced code block (collapsed in issue bodies)
+_HEADER_RE = re.compile(r'^(#{1,6})\s+(.+)$')
+_CODEBLOCK_RE = re.compile(r'```[\s\S]{500,}?```')
+
+# README, metadata and open issues in one GraphQL round-trip
+_REPO_QUERY = """
+query($owner: String!, $name: String!, $issues: Int!) {
+  repository(owner: $owner, name: $name) {
+    nameWithOwner
+    description
+    primaryLanguage { name }
+    stargazerCount
+    forkCount
+    repositoryTopics(first: 20) { nodes { topic { name } } }
+    openIssues: issues(states: OPEN) { totalCount }
+    openPullRequests: pullRequests(states: OPEN) { totalCount }
+    readmeMd: object(expression: "HEAD:README.md") { ... on Blob { text } }
+    readmeLower: object(expression: "HEAD:readme.md") { ... on Blob { text } }
+    readmeRst: object(expression: "HEAD:README.rst") { ... on Blob { text } }
+    readmePlain: object(expression: "HEAD:README") { ... on Blob { text } }
+    issues(first: $issues, states: OPEN, orderBy: {field: CREATED_AT, direction: DESC}) {
+      nodes {
+        number
+        title
+        body
+        url
+        createdAt
+        comments { totalCount }
+        labels(first: 20) { nodes { name } }
+      }
+    }
+  }
+}
+"""
+_README_ALIASES = (
+    ("readmeMd", "README.md"), ("readmeLower", "readme.md"),
+    ("readmeRst", "README.rst"), ("readmePlain", "README")
+)
+
+# Build/config files worth pointing contributors at (lowercased basenames)
+_IMPORTANT_FILES = frozenset({
+    'package.json', 'requirements.txt', 'cargo.toml', 'go.mod', 'pom.xml', 'dockerfile',
+    'docker-compose.yml', 'tsconfig.json', 'vite.config.ts', 'next.config.js'
+})
+
+
+def create_github_client(token: Optional[str] = None) -> httpx.AsyncClient:
+    """
+    Build the long-lived HTTP/2 client used for all GitHub REST traffic.
+    Keep-alive connections are reused across requests, so only the first call
+    pays for the TCP + TLS handshake.
+    """
+    token = token or os.getenv("GITHUB_TOKEN")
+    headers = {"Accept": "application/vnd.github+json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=64, max_connections=128),
+        headers=headers,
+        timeout=30
+    )
+
 
 class GitHubFetcher:
     """Fetch repository data from GitHub for RAG indexing."""
     
-    def __init__(self, token: Optional[str] = None):
+    def __init__(self, client: httpx.AsyncClient, token: Optional[str] = None):
+        """
+        Args:
+            client: Shared async HTTP client from create_github_client()
+                (owned and closed by the caller)
+            token: GitHub token, defaults to GITHUB_TOKEN
+        """
         self.token = token or os.getenv("GITHUB_TOKEN")
         if not self.token:
             raise ValueError("GITHUB_TOKEN is required")
         
-        self.client = Github(auth=Auth.Token(self.token))
+        self.http = client
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
         logger.info("[Fetcher] GitHub client initialized")
     
+    async def _get_json(self, path: str, params: Optional[Dict] = None):
+        """GET a GitHub REST endpoint and return the decoded JSON body."""
+        async with self._semaphore:
+            response = await self.http.get(f"{GITHUB_API_URL}{path}", params=params)
+        response.raise_for_status()
+        return response.json()
+    
     def parse_repo_url(self, url: str) -> str:
         """Parse GitHub URL to get owner/repo format."""
         url = url.rstrip("/")
@@ -43,169 +130,148 @@ class GitHubFetcher:
         Each section becomes a separate document with parent reference.
         """
         lines = content.split('\n')
-        sections = []
-        current_section = {
-            'title': 'Introduction',
-            'level': 0,
-            'content': [],
-            'line_start': 1
-        }
         
-        for i, line in enumerate(lines, 1):
-            # Check for markdown headers
-            header_match = re.match(r'^(#{1,6})\s+(.+)$', line)
-            
-            if header_match:
-                # Save previous section if it has content
-                if current_section['content']:
-                    sections.append({
-                        'title': current_section['title'],
-                        'level': current_section['level'],
-                        'content': '\n'.join(current_section['content']).strip(),
-                        'line_start': current_section['line_start'],
-                        'line_end': i - 1
-                    })
-                
-                # Start new section
-                level = len(header_match.group(1))
-                title = header_match.group(2).strip()
-                current_section = {
-                    'title': title,
-                    'level': level,
-                    'content': [line],
-                    'line_start': i
-                }
-            else:
-                current_section['content'].append(line)
+        # One pass for header positions, then slice the lines between them
+        bounds = [
+            (i, len(match.group(1)), match.group(2).strip())
+            for i, line in enumerate(lines)
+            if (match := _HEADER_RE.match(line))
+        ]
+        if not bounds or bounds[0][0] > 0:
+            bounds.insert(0, (0, 0, 'Introduction'))
         
-        # Don't forget the last section
-        if current_section['content']:
+        sections = []
+        for (start, level, title), (end, _, _) in zip(bounds, bounds[1:] + [(len(lines), 0, '')]):
             sections.append({
-                'title': current_section['title'],
-                'level': current_section['level'],
-                'content': '\n'.join(current_section['content']).strip(),
-                'line_start': current_section['line_start'],
-                'line_end': len(lines)
+                'title': title,
+                'level': level,
+                'content': '\n'.join(lines[start:end]).strip(),
+                'line_start': start + 1,
+                'line_end': end
             })
         
         return sections
     
-    def fetch_readme(self, repo_full_name: str) -> List[Dict]:
+    async def fetch_readme(self, repo_full_name: str) -> List[Dict]:
         """
         Fetch README and parse into sections.
         Returns multiple documents - one per section.
         """
         try:
-            repo = self.client.get_repo(repo_full_name)
-            readme = repo.get_readme()
-            content = base64.b64decode(readme.content).decode("utf-8")
-            
-            sections = self._chunk_readme_by_sections(content)
+            readme = await self._get_json(f"/repos/{repo_full_name}/readme")
+            content = base64.b64decode(readme["content"]).decode("utf-8")
+            return self.build_readme_documents(readme["name"], content)
             
-            documents = []
-            for section in sections:
-                # Skip empty or very small sections
-                if len(section['content']) < 20:
-                    continue
-                
-                documents.append({
-                    "content": section['content'],
-                    "type": "readme",
-                    "metadata": {
-                        "filename": readme.name,
-                        "section_title": section['title'],
-                        "section_level": section['level'],
-                        "line_start": section['line_start'],
-                        "line_end": section['line_end']
-                    }
-                })
-            
-            # Also store full README for parent-document retrieval
-            documents.append({
-                "content": content[:8000],  # First 8k chars
-                "type": "readme_full",
-                "metadata": {
-                    "filename": readme.name,
-                    "section_title": "Full Document"
-                }
-            })
-            
-            logger.info(f"[Fetcher] Parsed README into {len(documents)} sections")
-            return documents
-            
-        except GithubException as e:
+        except httpx.HTTPError as e:
             logger.warning(f"[Fetcher] Failed to fetch README: {e}")
             return []
     
-    def fetch_metadata(self, repo_full_name: str) -> Optional[Dict]:
-        """Fetch repository metadata."""
-        try:
-            repo = self.client.get_repo(repo_full_name)
-            
-            parts = [
-                f"Repository: {repo.full_name}",
-                f"Description: {repo.description or 'No description'}",
-                f"Language: {repo.language or 'Not specified'}",
-                f"Stars: {repo.stargazers_count}",
-                f"Forks: {repo.forks_count}",
-                f"Open Issues: {repo.open_issues_count}",
-            ]
-            
-            topics = repo.get_topics()
-            if topics:
-                parts.append(f"Topics: {', '.join(topics)}")
-            
-            content = "\n".join(parts)
-            
-            logger.info(f"[Fetcher] Fetched metadata for {repo.full_name}")
+    def build_readme_documents(self, filename: str, content: str) -> List[Dict]:
+        """Build the per-section and full README documents."""
+        documents = []
+        for section in self._chunk_readme_by_sections(content):
+            # Skip empty or very small sections
+            if len(section['content']) < 20:
+                continue
             
-            return {
-                "content": content,
-                "type": "metadata",
+            documents.append({
+                "content": section['content'],
+                "type": "readme",
                 "metadata": {
-                    "stars": repo.stargazers_count,
-                    "forks": repo.forks_count,
-                    "language": repo.language,
-                    "topics": topics
+                    "filename": filename,
+                    "section_title": section['title'],
+                    "section_level": section['level'],
+                    "line_start": section['line_start'],
+                    "line_end": section['line_end']
                 }
+            })
+        
+        # Also store full README for parent-document retrieval
+        documents.append({
+            "content": content[:8000],  # First 8k chars
+            "type": "readme_full",
+            "metadata": {
+                "filename": filename,
+                "section_title": "Full Document"
             }
-        except GithubException as e:
-            logger.warning(f"[Fetcher] Failed to fetch metadata: {e}")
+        })
+        
+        logger.info(f"[Fetcher] Parsed README into {len(documents)} sections")
+        return documents
+    
+    async def fetch_repo(self, repo_full_name: str) -> Optional[Dict]:
+        """Fetch the raw repository object (includes topics and default branch)."""
+        try:
+            return await self._get_json(f"/repos/{repo_full_name}")
+        except httpx.HTTPError as e:
+            logger.warning(f"[Fetcher] Failed to fetch repository: {e}")
             return None
     
-    def fetch_file_tree(self, repo_full_name: str, max_depth: int = 3) -> Optional[Dict]:
+    def build_metadata(self, repo: Dict) -> Dict:
+        """Build the metadata document from a repository object."""
+        parts = [
+            f"Repository: {repo['full_name']}",
+            f"Description: {repo.get('description') or 'No description'}",
+            f"Language: {repo.get('language') or 'Not specified'}",
+            f"Stars: {repo.get('stargazers_count', 0)}",
+            f"Forks: {repo.get('forks_count', 0)}",
+            f"Open Issues: {repo.get('open_issues_count', 0)}",
+        ]
+        
+        topics = repo.get("topics") or []
+        if topics:
+            parts.append(f"Topics: {', '.join(topics)}")
+        
+        content = "\n".join(parts)
+        
+        logger.info(f"[Fetcher] Fetched metadata for {repo['full_name']}")
+        
+        return {
+            "content": content,
+            "type": "metadata",
+            "metadata": {
+                "stars": repo.get("stargazers_count", 0),
+                "forks": repo.get("forks_count", 0),
+                "language": repo.get("language"),
+                "topics": topics
+            }
+        }
+    
+    async def fetch_metadata(self, repo_full_name: str) -> Optional[Dict]:
+        """Fetch repository metadata."""
+        repo = await self.fetch_repo(repo_full_name)
+        return self.build_metadata(repo) if repo else None
+    
+    async def fetch_file_tree(self, repo_full_name: str, max_depth: int = 3) -> Optional[Dict]:
         """
         Fetch repository file tree structure.
         Creates a searchable document of the directory structure.
         """
         try:
-            repo = self.client.get_repo(repo_full_name)
-            
-            # Get the default branch tree
-            tree = repo.get_git_tree(repo.default_branch, recursive=True)
+            # Get the default branch tree (HEAD resolves to it server-side)
+            tree = await self._get_json(
+                f"/repos/{repo_full_name}/git/trees/HEAD",
+                params={"recursive": "1"}
+            )
+            items = tree.get("tree", [])
             
             # Group files by directory
-            directories = {}
+            directories = defaultdict(list)
             important_files = []
             
-            for item in tree.tree:
-                if item.type == "blob":  # It's a file
-                    path = item.path
-                    parts = path.split('/')
-                    
-                    # Track important files
-                    basename = parts[-1].lower()
-                    if basename in ['package.json', 'requirements.txt', 'cargo.toml', 
-                                   'go.mod', 'pom.xml', 'dockerfile', 'docker-compose.yml',
-                                   'tsconfig.json', 'vite.config.ts', 'next.config.js']:
-                        important_files.append(path)
-                    
-                    # Track source directories
-                    if len(parts) <= max_depth:
-                        dir_path = '/'.join(parts[:-1]) or '/'
-                        if dir_path not in directories:
-                            directories[dir_path] = []
-                        directories[dir_path].append(parts[-1])
+            for item in items:
+                if item["type"] != "blob":  # Files only
+                    continue
+                path = item["path"]
+                dir_path, _, basename = path.rpartition('/')
+                
+                # Track important files
+                if basename.lower() in _IMPORTANT_FILES:
+                    important_files.append(path)
+                
+                # Track source directories
+                if path.count('/') < max_depth:
+                    directories[dir_path or '/'].append(basename)
             
             # Build a searchable description
             content_parts = [
@@ -231,90 +297,175 @@ class GitHubFetcher:
             
             content = "\n".join(content_parts)
             
-            logger.info(f"[Fetcher] Fetched file tree ({len(tree.tree)} items)")
+            logger.info(f"[Fetcher] Fetched file tree ({len(items)} items)")
             
             return {
                 "content": content,
                 "type": "file_tree",
                 "metadata": {
-                    "total_files": len(tree.tree),
+                    "total_files": len(items),
                     "important_files": important_files[:10],
                     "key_directories": list(directories.keys())[:20]
                 }
             }
             
-        except GithubException as e:
+        except httpx.HTTPError as e:
             logger.warning(f"[Fetcher] Failed to fetch file tree: {e}")
             return None
     
-    def fetch_issues(self, repo_full_name: str, limit: int = 50) -> List[Dict]:
+    async def fetch_issues(self, repo_full_name: str, limit: int = 50) -> List[Dict]:
         """Fetch open issues with enhanced metadata."""
         try:
-            repo = self.client.get_repo(repo_full_name)
-            issues = repo.get_issues(state="open", sort="created", direction="desc")
-            
-            documents = []
-            for issue in issues[:limit]:
-                if issue.pull_request:
-                    continue
-                
-                labels = [label.name for label in issue.labels]
-                
-                # Enhanced content with more context
-                content_parts = [
-                    f"Issue #{issue.number}: {issue.title}",
-                    f"Labels: {', '.join(labels) if labels else 'None'}",
-                ]
-                
-                if issue.body:
-                    # Clean up body - remove very long code blocks
-                    body = issue.body
-                    body = re.sub(r'```[\s\S]{500,}?```', '[code block]', body)
-                    content_parts.append(f"Description: {body[:1500]}")
-                
-                documents.append({
-                    "content": "\n".join(content_parts),
-                    "type": "issue",
-                    "metadata": {
-                        "number": issue.number,
-                        "title": issue.title,
-                        "labels": labels,
-                        "url": issue.html_url,
-                        "comments": issue.comments,
-                        "created_at": issue.created_at.isoformat() if issue.created_at else None,
-                        "is_good_first": any('good first' in l.lower() or 'beginner' in l.lower() for l in labels)
+            # The issues endpoint also lists pull requests (skipped below).
+            # Pages are independent, so request them all at once.
+            per_page = max(1, min(limit, 100))
+            pages = await asyncio.gather(*(
+                self._get_json(
+                    f"/repos/{repo_full_name}/issues",
+                    params={
+                        "state": "open",
+                        "sort": "created",
+                        "direction": "desc",
+                        "per_page": per_page,
+                        "page": page
                     }
-                })
-            
-            logger.info(f"[Fetcher] Fetched {len(documents)} issues")
-            return documents
+                )
+                for page in range(1, math.ceil(limit / per_page) + 1)
+            ))
+            issues = [issue for batch in pages for issue in batch]
+            return self.build_issue_documents(issues[:limit])
             
-        except GithubException as e:
+        except httpx.HTTPError as e:
             logger.warning(f"[Fetcher] Failed to fetch issues: {e}")
             return []
     
-    def fetch_all(self, repo_url: str, issue_limit: int = 50) -> Dict:
-        """Fetch all data from a repository."""
-        repo_name = self.parse_repo_url(repo_url)
-        
+    def build_issue_documents(self, issues: List[Dict]) -> List[Dict]:
+        """Build issue documents from REST-shaped issue objects (pull requests are skipped)."""
         documents = []
+        for issue in issues:
+            if "pull_request" in issue:
+                continue
+            
+            labels = [label["name"] for label in issue.get("labels", [])]
+            
+            # Enhanced content with more context
+            content_parts = [
+                f"Issue #{issue['number']}: {issue['title']}",
+                f"Labels: {', '.join(labels) if labels else 'None'}",
+            ]
+            
+            if issue.get("body"):
+                # Clean up body - remove very long code blocks
+                body = issue["body"]
+                body = _CODEBLOCK_RE.sub('[code block]', body)
+                content_parts.append(f"Description: {body[:1500]}")
+            
+            documents.append({
+                "content": "\n".join(content_parts),
+                "type": "issue",
+                "metadata": {
+                    "number": issue["number"],
+                    "title": issue["title"],
+                    "labels": labels,
+                    "url": issue["html_url"],
+                    "comments": issue.get("comments", 0),
+                    "created_at": issue.get("created_at"),
+                    "is_good_first": any('good first' in l.lower() or 'beginner' in l.lower() for l in labels)
+                }
+            })
         
-        # Fetch README sections
-        readme_docs = self.fetch_readme(repo_name)
-        documents.extend(readme_docs)
+        logger.info(f"[Fetcher] Fetched {len(documents)} issues")
+        return documents
+    
+    async def fetch_graphql(self, repo_full_name: str, issue_limit: int = 50) -> Optional[Dict]:
+        """
+        Fetch README, metadata and open issues in a single GraphQL request.
+        Returns {"readme", "repo", "issues"} shaped like the REST results,
+        or None if the query fails (callers fall back to REST).
+        """
+        if issue_limit > 100:
+            return None  # Beyond GraphQL's page size; REST paginates concurrently
         
-        # Fetch metadata
-        metadata = self.fetch_metadata(repo_name)
-        if metadata:
-            documents.append(metadata)
+        owner, name = repo_full_name.split("/", 1)
+        try:
+            async with self._semaphore:
+                response = await self.http.post(GITHUB_GRAPHQL_URL, json={
+                    "query": _REPO_QUERY,
+                    "variables": {"owner": owner, "name": name, "issues": issue_limit}
+                })
+            response.raise_for_status()
+            body = response.json()
+        except httpx.HTTPError as e:
+            logger.warning(f"[Fetcher] GraphQL fetch failed: {e}")
+            return None
         
-        # Fetch file tree
-        file_tree = self.fetch_file_tree(repo_name)
+        repository = (body.get("data") or {}).get("repository")
+        if body.get("errors") or not repository:
+            logger.warning(f"[Fetcher] GraphQL fetch failed: {body.get('errors')}")
+            return None
+        
+        readme = next(
+            ((filename, repository[alias]["text"]) for alias, filename in _README_ALIASES
+             if (repository.get(alias) or {}).get("text")),
+            None
+        )
+        
+        # Map onto the REST field names used by build_metadata/build_issue_documents
+        repo = {
+            "full_name": repository["nameWithOwner"],
+            "description": repository["description"],
+            "language": (repository["primaryLanguage"] or {}).get("name"),
+            "stargazers_count": repository["stargazerCount"],
+            "forks_count": repository["forkCount"],
+            # REST's open_issues_count includes open pull requests
+            "open_issues_count": repository["openIssues"]["totalCount"] + repository["openPullRequests"]["totalCount"],
+            "topics": [node["topic"]["name"] for node in repository["repositoryTopics"]["nodes"]]
+        }
+        issues = [
+            {
+                "number": issue["number"],
+                "title": issue["title"],
+                "body": issue["body"],
+                "html_url": issue["url"],
+                "created_at": issue["createdAt"],
+                "comments": issue["comments"]["totalCount"],
+                "labels": issue["labels"]["nodes"]
+            }
+            for issue in repository["issues"]["nodes"]
+        ]
+        
+        return {"readme": readme, "repo": repo, "issues": issues}
+    
+    async def fetch_all(self, repo_url: str, issue_limit: int = 50) -> Dict:
+        """Fetch all data from a repository."""
+        repo_name = self.parse_repo_url(repo_url)
+        
+        # One GraphQL query covers README, metadata and issues; the recursive
+        # tree is REST-only, so it runs alongside. REST is the fallback.
+        tree_task = asyncio.create_task(self.fetch_file_tree(repo_name))
+        graph = await self.fetch_graphql(repo_name, issue_limit)
+        if graph:
+            if graph["readme"]:
+                readme_docs = self.build_readme_documents(*graph["readme"])
+            else:
+                # GraphQL only probes a few exact names; REST /readme also
+                # resolves other cases/extensions and docs/ or .github/
+                readme_docs = await self.fetch_readme(repo_name)
+            repo = graph["repo"]
+            issues = self.build_issue_documents(graph["issues"])
+        else:
+            readme_docs, repo, issues = await asyncio.gather(
+                self.fetch_readme(repo_name),
+                self.fetch_repo(repo_name),
+                self.fetch_issues(repo_name, limit=issue_limit)
+            )
+        file_tree = await tree_task
+        
+        documents = list(readme_docs)
+        if repo:
+            documents.append(self.build_metadata(repo))
         if file_tree:
             documents.append(file_tree)
-        
-        # Fetch issues
-        issues = self.fetch_issues(repo_name, limit=issue_limit)
         documents.extend(issues)
         
         logger.info(f"[Fetcher] Total documents fetched: {len(documents)}")
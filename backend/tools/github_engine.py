@@ -1,14 +1,256 @@
 import os
+import re
+import asyncio
+import copy
+import time
 import base64
+import logging
+import random
+import itertools
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from urllib.parse import quote
+from cachetools import LRUCache, TTLCache
 from github import Github, GithubException, Auth
+from github.GithubRetry import GithubRetry
 from typing import List, Dict, Optional
 
+logger = logging.getLogger(__name__)
+
+# https://github.com/<owner>/<repo>/(issues|pull)/<number>
+_URL_RE = re.compile(r"https?://github\.com/([^/]+)/([^/]+)/(?:issues|pull)/(\d+)")
+
+# Git file modes of a directory's entries (ints, e.g. 33261 == 0o100755)
+_TREE_MODES_QUERY = """
+query($owner: String!, $name: String!, $expression: String!) {
+  repository(owner: $owner, name: $name) {
+    object(expression: $expression) { ... on Tree { entries { name mode } } }
+  }
+}
+"""
+
+# Domain to GitHub search query mapping
+_DOMAIN_QUERIES = {
+    "react": "language:javascript language:typescript topic:react",
+    "python": "language:python",
+    "machine-learning": "language:python topic:machine-learning topic:deep-learning topic:tensorflow topic:pytorch",
+    "rust": "language:rust",
+    "go": "language:go",
+    "javascript": "language:javascript",
+    "typescript": "language:typescript",
+    "java": "language:java",
+    "cpp": "language:c++",
+    "web": "topic:web topic:frontend topic:css topic:html",
+    "backend": "topic:backend topic:api topic:rest",
+    "mobile": "topic:android topic:ios topic:react-native topic:flutter",
+    "devops": "topic:devops topic:docker topic:kubernetes topic:ci-cd",
+    "data": "topic:data-science topic:data-analysis topic:pandas",
+}
+
+
+@functools.lru_cache(maxsize=8)
+def _cutoff_str(days_ago: int, today_iso: str) -> str:
+    """ISO date days_ago before today_iso; keyed on today so it rolls over daily."""
+    return (date.fromisoformat(today_iso) - timedelta(days=days_ago)).isoformat()
+
+
+class RateLimitError(Exception):
+    """A GitHub rate limit would be exhausted; retry after reset_at (epoch seconds)."""
+    
+    def __init__(self, resource: str, reset_at: float):
+        self.resource = resource
+        self.reset_at = reset_at
+        super().__init__(
+            f"GitHub {resource} rate limit exhausted, resets in {max(int(reset_at - time.time()), 0)}s"
+        )
+
+
 class GitHubEngine:
     def __init__(self, token: Optional[str] = None):
         self.token = token or os.getenv("GITHUB_TOKEN")
         if not self.token:
             raise ValueError("GITHUB_TOKEN is required")
-        self.client = Github(auth=Auth.Token(self.token))
+        self.client = self._make_client()
+        
+        # Repository lookups for search results run on these workers, each
+        # with its own client (see _thread_client); the constructing thread
+        # keeps self.client
+        self._pool = ThreadPoolExecutor(max_workers=8)
+        self._local = threading.local()
+        self._local.client = self.client
+        
+        # Remaining quota per resource ("core", "search"), refreshed from
+        # /rate_limit at most once a minute and counted down locally
+        self._rate_lock = threading.Lock()
+        self._rate_limits: Dict[str, Dict] = {}
+        
+        # Short-lived result caches: issue searches (60 s, the Search API
+        # allows 30 requests/min) and file contents (300 s). Empty results
+        # expire after 30 s so transient failures aren't pinned.
+        self._cache_lock = threading.RLock()
+        self._search_cache = TTLCache(maxsize=256, ttl=60)
+        self._file_cache = TTLCache(maxsize=256, ttl=300)
+        self._empty_cache = TTLCache(maxsize=256, ttl=30)
+        # Files that 404'd are confidently absent: remember them for 30 min
+        # (other failures fall back to the 30 s empty-result cache)
+        self._missing_cache = TTLCache(maxsize=1024, ttl=1800)
+        # (repo, path) -> (etag, content); outlives the TTL so a stale entry
+        # can be revalidated with a conditional request
+        self._etag_cache = LRUCache(maxsize=1024)
+    
+    def _make_client(self) -> Github:
+        # One pooled session for every call (fork -> branch -> commit -> PR
+        # reuses the same TLS connections); 5xx/secondary-rate-limit
+        # responses are retried with backoff, and per_page=100 cuts
+        # pagination round-trips
+        return Github(
+            auth=Auth.Token(self.token),
+            retry=GithubRetry(total=5, backoff_factor=0.5),
+            pool_size=20,
+            per_page=100
+        )
+    
+    def _check_rate_limit(self, resource: str, calls: int = 1, wait: bool = False):
+        """
+        Reserve quota for the next `calls` requests against a rate-limit
+        resource. When it would run out, sleep until the reset (wait=True,
+        for background jobs) or raise RateLimitError before any request is
+        made, so multi-step flows don't fail halfway. Secondary limits
+        (403/429 with Retry-After) are handled by GithubRetry.
+        """
+        with self._rate_lock:
+            now = time.time()
+            rate = self._rate_limits.get(resource)
+            if rate is None or now - rate["checked"] > 60 or now >= rate["reset"]:
+                current = getattr(self._thread_client().get_rate_limit(), resource)
+                rate = self._rate_limits[resource] = {
+                    "remaining": current.remaining,
+                    "reset": current.reset.timestamp(),
+                    "checked": now
+                }
+            if rate["remaining"] >= calls:
+                rate["remaining"] -= calls
+                return
+            reset_at = rate["reset"]
+            del self._rate_limits[resource]  # Re-read after the reset
+        
+        if not wait:
+            raise RateLimitError(resource, reset_at)
+        time.sleep(max(reset_at - time.time(), 0) + 1)
+        self._check_rate_limit(resource, calls, wait)
+    
+    def _thread_client(self) -> Github:
+        """
+        Client for the calling worker thread. A Github instance shares one
+        connection object whose request/response state is not thread-safe,
+        so concurrent lookups and requests served from different event-loop
+        worker threads can't all go through self.client.
+        """
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self._make_client()
+        return client
+    
+    def _get_repo_info(self, full_name: str) -> Dict:
+        """Language and star count of a repository (runs on a pool worker)."""
+        try:
+            repo = self._thread_client().get_repo(full_name)
+            return {"language": repo.language, "stars": repo.stargazers_count}
+        except GithubException:
+            return {"language": None, "stars": 0}
+    
+    def _get_repos_info(self, repo_names: List[str]) -> Dict[str, Dict]:
+        """
+        Language and star count for several repositories in one GraphQL
+        request (one aliased repository() field each). Repositories the
+        query can't resolve are looked up over REST in parallel.
+        """
+        info = {}
+        if repo_names:
+            params = ", ".join(f"$o{i}: String!, $n{i}: String!" for i in range(len(repo_names)))
+            fields = " ".join(
+                f"r{i}: repository(owner: $o{i}, name: $n{i}) {{ primaryLanguage {{ name }} stargazerCount }}"
+                for i in range(len(repo_names))
+            )
+            variables = {}
+            for i, full_name in enumerate(repo_names):
+                variables[f"o{i}"], variables[f"n{i}"] = full_name.split("/", 1)
+            
+            try:
+                _, response = self._thread_client()._Github__requester.requestJsonAndCheck(
+                    "POST", "/graphql",
+                    input={"query": f"query({params}) {{ {fields} }}", "variables": variables}
+                )
+                data = response.get("data") or {}
+                for i, full_name in enumerate(repo_names):
+                    repo = data.get(f"r{i}")
+                    if repo:
+                        info[full_name] = {
+                            "language": (repo["primaryLanguage"] or {}).get("name"),
+                            "stars": repo["stargazerCount"]
+                        }
+            except Exception as e:  # Any failure just means the REST path
+                logger.warning("[GitHub] GraphQL lookup failed, using REST: %s", e)
+        
+        missing = [full_name for full_name in repo_names if full_name not in info]
+        info.update(zip(missing, self._pool.map(self._get_repo_info, missing)))
+        return info
+    
+    def _enrich_issue(self, issue, repo_info: Dict) -> Dict:
+        """Result dict for a search hit, using fields from the search payload only."""
+        created_at = (
+            issue.created_at.replace(tzinfo=None).isoformat(" ", "minutes") if issue.created_at else "Unknown"
+        )
+        
+        # Get labels
+        labels = [label.name for label in issue.labels] if issue.labels else []
+        
+        # Repo info for tech stack hints
+        language = repo_info["language"] or "Unknown"
+        stars = repo_info["stars"]
+        
+        logger.debug("[GitHub] Found: %s | %s | ⭐%s", issue.title, language, stars)
+        
+        return {
+            "title": issue.title,
+            "url": issue.html_url,
+            "repo_name": self._issue_repo_name(issue),
+            "number": issue.number,
+            "comments": issue.comments,
+            "created_at": created_at,
+            "labels": labels,
+            "language": language,
+            "stars": stars,
+            "body": (issue.body or "")[:500]  # First 500 chars for skill analysis
+        }
+    
+    @staticmethod
+    def _issue_repo_name(issue) -> str:
+        # From the API URL (.../repos/{owner}/{repo}/issues/{n}); issue.repository
+        # would first re-fetch the issue, then the repository
+        return "/".join(issue.url.split("/")[-4:-2])
+    
+    def cache_clear(self):
+        """Drop all cached search results and file contents."""
+        with self._cache_lock:
+            self._search_cache.clear()
+            self._file_cache.clear()
+            self._empty_cache.clear()
+            self._missing_cache.clear()
+            self._etag_cache.clear()
+    
+    def _cache_get(self, cache: TTLCache, key):
+        """Cached value for key (from cache or the empty-result cache), else None."""
+        with self._cache_lock:
+            if key in cache:
+                return cache[key]
+            return self._empty_cache.get(key)
+    
+    def _cache_set(self, cache: TTLCache, key, value):
+        with self._cache_lock:
+            (cache if value else self._empty_cache)[key] = value
 
     def search_issues(self, limit: int = 5, domain: str = None, sort_by: str = "recent") -> List[Dict]:
         """
@@ -19,28 +261,13 @@ class GitHubEngine:
             domain: Filter by domain (react, python, ml, rust, go, javascript, etc.)
             sort_by: 'recent' (created date) or 'popular' (reactions/comments)
         """
-        from datetime import datetime, timedelta
-        
-        # Domain to GitHub search query mapping
-        domain_queries = {
-            "react": "language:javascript language:typescript topic:react",
-            "python": "language:python",
-            "machine-learning": "language:python topic:machine-learning topic:deep-learning topic:tensorflow topic:pytorch",
-            "rust": "language:rust",
-            "go": "language:go",
-            "javascript": "language:javascript",
-            "typescript": "language:typescript",
-            "java": "language:java",
-            "cpp": "language:c++",
-            "web": "topic:web topic:frontend topic:css topic:html",
-            "backend": "topic:backend topic:api topic:rest",
-            "mobile": "topic:android topic:ios topic:react-native topic:flutter",
-            "devops": "topic:devops topic:docker topic:kubernetes topic:ci-cd",
-            "data": "topic:data-science topic:data-analysis topic:pandas",
-        }
-        
         # Build query
-        cutoff = (datetime.now() - timedelta(days=14)).strftime("%Y-%m-%d")
+        cutoff = _cutoff_str(14, date.today().isoformat())
+        
+        cache_key = ("search", (domain or "").lower(), sort_by, limit, cutoff)
+        cached = self._cache_get(self._search_cache, cache_key)
+        if cached is not None:
+            return copy.deepcopy(cached)
         
         query_parts = [
             'label:"good first issue"',
@@ -49,8 +276,9 @@ class GitHubEngine:
         ]
         
         # Add domain filter if specified
-        if domain and domain.lower() in domain_queries:
-            query_parts.append(domain_queries[domain.lower()])
+        domain_query = _DOMAIN_QUERIES.get(domain.lower()) if domain else None
+        if domain_query:
+            query_parts.append(domain_query)
         
         query = " ".join(query_parts)
         
@@ -58,58 +286,39 @@ class GitHubEngine:
         # 'popular' uses comments as a proxy for engagement
         sort_order = "comments" if sort_by == "popular" else "created"
         
-        print(f"[DEBUG] GitHub Query: {query}")
-        print(f"[DEBUG] Sort by: {sort_order}")
+        logger.debug("[GitHub] Query: %s (sort: %s)", query, sort_order)
         
-        issues = self.client.search_issues(query, sort=sort_order, order="desc")
-        results = []
+        self._check_rate_limit("search")
+        issues = list(itertools.islice(
+            self._thread_client().search_issues(query, sort=sort_order, order="desc"), limit
+        ))
         
-        for issue in issues:
-            if len(results) >= limit:
-                break
-            
-            created_at = issue.created_at.strftime("%Y-%m-%d %H:%M") if issue.created_at else "Unknown"
-            
-            # Get labels
-            labels = [label.name for label in issue.labels] if issue.labels else []
-            
-            # Get repo info for tech stack hints
-            repo = issue.repository
-            language = repo.language or "Unknown"
-            stars = repo.stargazers_count
-            
-            print(f"[DEBUG] Found: {issue.title} | {language} | ⭐{stars}")
-            
-            results.append({
-                "title": issue.title,
-                "url": issue.html_url,
-                "repo_name": issue.repository.full_name,
-                "number": issue.number,
-                "comments": issue.comments,
-                "created_at": created_at,
-                "labels": labels,
-                "language": language,
-                "stars": stars,
-                "body": (issue.body or "")[:500]  # First 500 chars for skill analysis
-            })
-        
-        print(f"[DEBUG] Total results: {len(results)}")
+        # One GraphQL round-trip for all distinct repositories
+        repo_info = self._get_repos_info(
+            list(dict.fromkeys(self._issue_repo_name(issue) for issue in issues))
+        )
+        
+        results = [
+            self._enrich_issue(issue, repo_info[self._issue_repo_name(issue)])
+            for issue in issues
+        ]
+        
+        logger.debug("[GitHub] Total results: %d", len(results))
+        self._cache_set(self._search_cache, cache_key, copy.deepcopy(results))
         return results
 
     def get_issue_details(self, issue_url: str) -> Dict:
         """Parse issue URL and fetch details."""
         # Expected format: https://github.com/owner/repo/issues/number
-        parts = issue_url.rstrip("/").split("/")
-        if "github.com" not in parts:
+        m = _URL_RE.match(issue_url.strip())
+        if not m:
             raise ValueError("Invalid GitHub URL")
+        owner, repo_name, number = m.group(1), m.group(2), int(m.group(3))
             
         try:
-            owner = parts[-4]
-            repo_name = parts[-3]
-            number = int(parts[-1])
             repo_full_name = f"{owner}/{repo_name}"
             
-            repo = self.client.get_repo(repo_full_name)
+            repo = self._thread_client().get_repo(repo_full_name)
             issue = repo.get_issue(number)
             
             return {
@@ -121,18 +330,85 @@ class GitHubEngine:
                 "body": issue.body or "",
                 "repo": repo
             }
-        except (IndexError, ValueError) as e:
-             raise ValueError(f"Could not parse issue URL: {e}")
         except GithubException as e:
             raise ValueError(f"GitHub API Error: {e}")
 
     def get_file_content(self, repo, path: str) -> str:
         """Fetch content of a specific file."""
+        cache_key = ("file", repo.full_name, path)
+        cached = self._cache_get(self._file_cache, cache_key)
+        if cached is not None:
+            return cached
+        with self._cache_lock:
+            if cache_key in self._missing_cache:
+                return ""
+        
+        # Revalidate with If-None-Match: a 304 has no body and costs no quota
+        with self._cache_lock:
+            etag, stale = self._etag_cache.get((repo.full_name, path), (None, None))
+        headers = {"If-None-Match": etag} if etag else None
+        
         try:
-            file_content = repo.get_contents(path)
-            return base64.b64decode(file_content.content).decode("utf-8")
-        except GithubException:
-            return ""
+            response_headers, data = repo._requester.requestJsonAndCheck(
+                "GET", f"{repo.url}/contents/{quote(path)}", headers=headers
+            )
+            if data is None and stale is not None:  # 304 Not Modified
+                content = stale
+            elif isinstance(data, dict) and data.get("content"):
+                content = base64.b64decode(data["content"]).decode("utf-8")
+                if response_headers.get("etag"):
+                    with self._cache_lock:
+                        self._etag_cache[(repo.full_name, path)] = (response_headers["etag"], content)
+            else:
+                content = ""
+        except GithubException as e:
+            if e.status == 404:
+                with self._cache_lock:
+                    self._missing_cache[cache_key] = True
+                return ""
+            content = ""
+        
+        self._cache_set(self._file_cache, cache_key, content)
+        return content
+
+    def _wait_for_fork(self, fork, timeout: float = 30):
+        """Default branch of a new fork, polling with jittered backoff while it 404s."""
+        deadline = time.monotonic() + timeout
+        delay = 0.5
+        while True:
+            try:
+                return fork.get_branch(fork.default_branch)
+            except GithubException as e:
+                if e.status != 404 or time.monotonic() + delay > deadline:
+                    raise ValueError(f"Could not read branch of fork {fork.full_name}: {e}")
+            time.sleep(delay + random.random() * 0.1)
+            delay = min(delay * 2, 4)
+
+    def _file_mode(self, repo, commit_sha: str, path: str) -> str:
+        """
+        Git mode of path at commit_sha, so a rewrite keeps e.g. the executable
+        bit; "100644" for new files or if the lookup fails.
+        """
+        directory, _, name = path.rpartition("/")
+        try:
+            _, response = repo._requester.requestJsonAndCheck(
+                "POST", "/graphql",
+                input={
+                    "query": _TREE_MODES_QUERY,
+                    "variables": {
+                        "owner": repo.owner.login,
+                        "name": repo.name,
+                        "expression": f"{commit_sha}:{directory}",
+                    },
+                },
+            )
+            tree = ((response.get("data") or {}).get("repository") or {}).get("object") or {}
+            for entry in tree.get("entries") or []:
+                if entry["name"] == name:
+                    return format(entry["mode"], "o")
+        except Exception as e:
+            logger.warning("[GitHub] Could not read mode of %s, using 100644: %s", path, e)
+        return "100644"
 
     def fork_and_create_pr(self, 
                           repo_full_name: str, 
@@ -144,51 +420,59 @@ class GitHubEngine:
                           ) -> str:
         """
         1. Fork repo
-        2. Create branch
-        3. Commit with DCO
+        2. Commit with DCO
+        3. Create branch
         4. Open PR
         """
+        # The whole flow is ~8 core requests; fail before forking if the
+        # quota can't cover it rather than leaving a half-made branch
+        self._check_rate_limit("core", calls=8)
+        
         # 1. Get Repo & Fork
-        original_repo = self.client.get_repo(repo_full_name)
-        user = self.client.get_user()
+        client = self._thread_client()
+        original_repo = client.get_repo(repo_full_name)
+        user = client.get_user()
         
         try:
             fork = user.create_fork(original_repo)
-            # Fetch fork object to ensure we have the full object with permissions (sometimes async)
-            # In a real app, might need a retry loop here as forking isn't instant
         except GithubException:
             # Fork might already exist
-            fork = self.client.get_repo(f"{user.login}/{original_repo.name}")
-
-        # 2. Create Branch
-        # Get default branch sha
-        default_branch = fork.default_branch
-        sb = fork.get_branch(default_branch)
+            fork = client.get_repo(f"{user.login}/{original_repo.name}")
         
+        # Forking is asynchronous; the branch 404s until the copy is ready
+        sb = self._wait_for_fork(fork)
+
+        # 2. Commit via the Git Data API: a tree with the new file inlined
+        # (no separate blob or get_contents SHA lookup), a commit on top of
+        # the default branch, then the branch ref pointing at it
         branch_name = f"fix-issue-{issue_number}-{int(os.urandom(4).hex(), 16)}"
+        message = f"Fix issue #{issue_number}\n\nSigned-off-by: {dco_name} <{dco_email}>"
+        mode = self._file_mode(fork, sb.commit.sha, file_path)
         
         try:
-            fork.create_git_ref(ref=f"refs/heads/{branch_name}", sha=sb.commit.sha)
+            _, tree = fork._requester.requestJsonAndCheck(
+                "POST", f"{fork.url}/git/trees",
+                input={
+                    "base_tree": sb.commit.commit.tree.sha,
+                    "tree": [{"path": file_path, "mode": mode, "type": "blob", "content": new_content}],
+                },
+            )
+            _, commit = fork._requester.requestJsonAndCheck(
+                "POST", f"{fork.url}/git/commits",
+                input={"message": message, "tree": tree["sha"], "parents": [sb.commit.sha]},
+            )
         except GithubException as e:
-            # If branch exists (unlikely with random), fail or handle
-            raise ValueError(f"Could not create branch: {e}")
-
-        # 3. Commit
-        # Get current file sha for update
+            raise ValueError(f"Could not commit file: {e}")
+        
+        # 3. Create Branch at the new commit
         try:
-            contents = fork.get_contents(file_path, ref=branch_name)
-            sha = contents.sha
-            message = f"Fix issue #{issue_number}\n\nSigned-off-by: {dco_name} <{dco_email}>"
-            
-            fork.update_file(
-                path=file_path,
-                message=message,
-                content=new_content,
-                sha=sha,
-                branch=branch_name
+            fork._requester.requestJsonAndCheck(
+                "POST", f"{fork.url}/git/refs",
+                input={"ref": f"refs/heads/{branch_name}", "sha": commit["sha"]},
             )
         except GithubException as e:
-            raise ValueError(f"Could not commit file: {e}")
+            # If branch exists (unlikely with random), fail or handle
+            raise ValueError(f"Could not create branch: {e}")
 
         # 4. Create PR
         # PR is created on the ORIGINAL repo, from the fork's branch
@@ -205,3 +489,18 @@ class GitHubEngine:
             return pr.html_url
         except GithubException as e:
              raise ValueError(f"Could not create PR: {e}")
+
+    # Async wrappers: run the blocking calls on a worker thread so FastAPI
+    # handlers don't stall the event loop
+
+    async def search_issues_async(self, limit: int = 5, domain: str = None, sort_by: str = "recent") -> List[Dict]:
+        return await asyncio.to_thread(self.search_issues, limit=limit, domain=domain, sort_by=sort_by)
+
+    async def get_issue_details_async(self, issue_url: str) -> Dict:
+        return await asyncio.to_thread(self.get_issue_details, issue_url)
+
+    async def get_file_content_async(self, repo, path: str) -> str:
+        return await asyncio.to_thread(self.get_file_content, repo, path)
+
+    async def fork_and_create_pr_async(self, *args, **kwargs) -> str:
+        return await asyncio.to_thread(self.fork_and_create_pr, *args, **kwargs)
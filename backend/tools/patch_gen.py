@@ -1,26 +1,78 @@
 import os
+import re
+import asyncio
+import ast
+import hashlib
+import threading
+from typing import ClassVar, Iterator, Optional, Tuple
+from cachetools import LRUCache
 from huggingface_hub import InferenceClient
 
+# Opening (with optional language tag) and closing markdown code fences
+_FENCE_RE = re.compile(r"\A```[\w+#.-]*[ \t]*\n?")
+_TAIL_RE = re.compile(r"\n?```\s*\Z")
+_IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
 class PatchGenerator:
+    # Files larger than this are narrowed to the definitions the issue mentions
+    MAX_FILE_CHARS = 12_000
+    PATCH_CACHE_SIZE = 128
+
+    # Shared by every PatchGenerator (one is created per request): HTTPS
+    # connections to the inference API are reused, and the
+    # (issue hash, file hash) -> patched file cache makes retries free
+    _CLIENT: ClassVar[Optional[InferenceClient]] = None
+    _CLIENT_LOCK: ClassVar[threading.Lock] = threading.Lock()
+    _PATCH_CACHE: ClassVar[LRUCache] = LRUCache(maxsize=PATCH_CACHE_SIZE)
+
     def __init__(self):
         self.api_token = os.getenv("HUGGINGFACEHUB_API_TOKEN")
         if not self.api_token:
             raise ValueError("HUGGINGFACEHUB_API_TOKEN is required")
-            
-        self.client = InferenceClient(token=self.api_token)
+
+        self.client = self._get_client(self.api_token)
         # Use a model that works well with text_generation API
         self.model = "mistralai/Mistral-7B-Instruct-v0.2"
 
-    def generate_patch(self, issue_description: str, file_content: str) -> str:
+    @classmethod
+    def _get_client(cls, token: str) -> InferenceClient:
+        with cls._CLIENT_LOCK:
+            if cls._CLIENT is None:
+                cls._CLIENT = InferenceClient(token=token, timeout=60)
+            return cls._CLIENT
+
+    def _focus(self, issue_description: str, file_content: str) -> Optional[Tuple[int, int]]:
         """
-        Generates a fixed version of the file content based on the issue description.
+        For large Python files, return the (start, end) line range covering the
+        top-level definitions named in the issue, or None to send the whole file.
         """
-        # Format prompt for Mistral instruct model
-        prompt = f"""<s>[INST] You are an expert open source contributor.
-Your task is to fix a bug or add a feature in a file based on an issue description.
+        if len(file_content) <= self.MAX_FILE_CHARS:
+            return None
+        try:
+            tree = ast.parse(file_content)
+        except (SyntaxError, ValueError):
+            return None
+
+        mentioned = set(_IDENT_RE.findall(issue_description))
+        ranges = []
+        for node in tree.body:
+            if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            if node.name in mentioned:
+                start = min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1
+                ranges.append((start, node.end_lineno))
+
+        if not ranges:
+            return None
+        return min(r[0] for r in ranges), max(r[1] for r in ranges)
+
+    def _build_prompt(self, issue_description: str, content: str, excerpt: bool) -> str:
+        target = "excerpt" if excerpt else "file"
+        return f"""<s>[INST] You are an expert open source contributor.
+Your task is to fix a bug or add a feature in a {target} based on an issue description.
 
 RULES:
-1. You must output the FULL content of the fixed file.
+1. You must output the FULL content of the fixed {target}.
 2. Do NOT wrap your output in markdown code blocks.
 3. Keep changes minimal and focused on the issue.
 4. Ensure the code is valid and syntactically correct.
@@ -28,36 +80,73 @@ RULES:
 Issue Description:
 {issue_description}
 
-Original File Content:
-{file_content}
+Original {target.capitalize()} Content:
+{content}
 
-Output the complete fixed file content: [/INST]"""
+Output the complete fixed {target} content: [/INST]"""
 
+    def _stream(self, issue_description: str, content: str, excerpt: bool) -> Iterator[str]:
+        prompt = self._build_prompt(issue_description, content, excerpt)
         try:
             # Use text_generation which is available in huggingface_hub 0.20.1
-            result = self.client.text_generation(
+            yield from self.client.text_generation(
                 prompt,
                 model=self.model,
                 max_new_tokens=2048,
                 temperature=0.1,
                 top_p=0.9,
-                do_sample=True
+                do_sample=True,
+                stream=True
             )
-            
-            # Clean up result if wrapped in markdown code blocks
-            cleaned_result = result.strip()
-            
-            # Remove various code block formats
-            for lang in ['python', 'javascript', 'typescript', 'js', 'ts', 'jsx', 'tsx', 'vue', 'markdown', 'md', 'sql', 'svelte', 'css', '']:
-                block_start = f"```{lang}"
-                if cleaned_result.startswith(block_start):
-                    cleaned_result = cleaned_result[len(block_start):].lstrip()
-                    break
-            
-            if cleaned_result.endswith("```"):
-                cleaned_result = cleaned_result[:-3].rstrip()
-                
-            return cleaned_result.strip()
-
         except Exception as e:
             raise ValueError(f"AI Generation failed: {e}")
+
+    def generate_patch(self, issue_description: str, file_content: str) -> Iterator[str]:
+        """
+        Streams the model's fixed code as it is generated.
+        For large files only the focused excerpt is rewritten; use
+        generate_patch_full for the cleaned, complete file.
+        """
+        focus = self._focus(issue_description, file_content)
+        if focus is None:
+            return self._stream(issue_description, file_content, excerpt=False)
+        lines = file_content.splitlines(keepends=True)
+        return self._stream(issue_description, "".join(lines[focus[0]:focus[1]]), excerpt=True)
+
+    def generate_patch_full(self, issue_description: str, file_content: str) -> str:
+        """
+        Generates a fixed version of the file content based on the issue description.
+        """
+        key = (
+            hashlib.sha256(issue_description.encode()).hexdigest(),
+            hashlib.sha256(file_content.encode()).hexdigest(),
+        )
+        with self._CLIENT_LOCK:
+            cached = self._PATCH_CACHE.get(key)
+        if cached is not None:
+            return cached
+
+        focus = self._focus(issue_description, file_content)
+        lines = file_content.splitlines(keepends=True)
+        if focus is None:
+            result = "".join(self._stream(issue_description, file_content, excerpt=False))
+        else:
+            excerpt = "".join(lines[focus[0]:focus[1]])
+            result = "".join(self._stream(issue_description, excerpt, excerpt=True))
+
+        # Clean up result if wrapped in markdown code blocks
+        cleaned_result = _FENCE_RE.sub("", result.strip(), count=1)
+        cleaned_result = _TAIL_RE.sub("", cleaned_result).strip()
+
+        if focus is not None:
+            # Splice the rewritten excerpt back between the untouched lines
+            cleaned_result = "".join(lines[:focus[0]]) + cleaned_result + "\n" + "".join(lines[focus[1]:])
+            cleaned_result = cleaned_result.strip()
+
+        with self._CLIENT_LOCK:
+            self._PATCH_CACHE[key] = cleaned_result
+        return cleaned_result
+
+    async def generate_patch_full_async(self, issue_description: str, file_content: str) -> str:
+        """generate_patch_full on a worker thread, for use from async handlers."""
+        return await asyncio.to_thread(self.generate_patch_full, issue_description, file_content)
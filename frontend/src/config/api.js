@@ -9,15 +9,21 @@ export const api = {
     issues: () => `${API_URL}/api/issues`,
     indexRepo: () => `${API_URL}/api/index-repo`,
     analyze: () => `${API_URL}/api/analyze`,
+    analyzeStream: () => `${API_URL}/api/analyze/stream`,
     suggest: () => `${API_URL}/api/suggest`,
     techStack: () => `${API_URL}/api/tech-stack`,
     setup: () => `${API_URL}/api/setup`,
     warmthScore: () => `${API_URL}/api/warmth-score`,
+    repoOverview: () => `${API_URL}/api/repo-overview`,
     contribute: () => `${API_URL}/api/contribute`,
     difficulty: () => `${API_URL}/api/difficulty`,
+    difficultyBatch: () => `${API_URL}/api/difficulty/batch`,
     relevantFiles: () => `${API_URL}/api/relevant-files`,
+    relevantFilesBatch: () => `${API_URL}/api/relevant-files/batch`,
     issueSkills: () => `${API_URL}/api/issue-skills`,
+    issueSkillsBatch: () => `${API_URL}/api/issue-skills/batch`,
     codeReview: () => `${API_URL}/api/code-review`,
+    codeReviewStream: () => `${API_URL}/api/code-review/stream`,
     health: () => `${API_URL}/health`,
 };
 